@@ -1,4 +1,3 @@
-import mysql.connector
 import pandas as pd
 import streamlit as st
 import altair as alt
@@ -6,28 +5,14 @@ import matplotlib.pyplot as plt
 import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
-
-def get_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        port="3306",
-        user="root",
-        passwd="admin123",
-        db="iesa_db"
-    )
+from utils.table_cache import read_table
 
 # Fetch Data from a Table
 def fetch_table_data(table_name):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        query = f"SELECT * FROM `{table_name}`"
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        if not rows:
+        data = read_table(table_name)
+        if data.empty:
             return pd.DataFrame()
-        columns = [desc[0] for desc in cursor.description]
-        data = pd.DataFrame(rows, columns=columns)
 
         # Convert MW to GWh if applicable
         if "Installed Capacity (MW)" in data.columns:
@@ -42,8 +27,6 @@ def fetch_table_data(table_name):
     except Exception as e:
         print(f"Error fetching data from {table_name}: {e}")
         data = pd.DataFrame()
-    finally:
-        conn.close()
     
     return data
 
@@ -1,21 +1,12 @@
-import mysql.connector
 import pandas as pd
 import streamlit as st
 import altair as alt
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
+from utils.table_cache import read_table
 
 # Function to get a database connection
-def get_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        port="3306",
-        user="root",
-        passwd="admin123",
-        db="iesa_db"
-    )
-
 def circular_progress(label, value, max_value, color):
     """Create a circular progress indicator with custom styling"""
     # Calculate the percentage
@@ -38,25 +29,17 @@ def circular_progress(label, value, max_value, color):
 # Fetch data from a table
 def fetch_table_data(table_name):
     try:
-        conn = get_connection()
-        with conn.cursor() as cursor:
-            query = f"SELECT * FROM `{table_name}`"
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            if not rows:
-                return pd.DataFrame()
-            columns = [desc[0] for desc in cursor.description]
-            data = pd.DataFrame(rows, columns=columns)
+        data = read_table(table_name)
+        if data.empty:
+            return pd.DataFrame()
 
-            # Convert numeric columns to float
-            for col in data.columns[1:]:
-                data[col] = pd.to_numeric(data[col], errors="coerce")
-            data.fillna(0, inplace=True)
+        # Convert numeric columns to float
+        for col in data.columns[1:]:
+            data[col] = pd.to_numeric(data[col], errors="coerce")
+        data.fillna(0, inplace=True)
     except Exception as e:
         st.error(f"Error fetching data: {e}")
         data = pd.DataFrame()
-    finally:
-        conn.close()
 
     return data
 
@@ -4,7 +4,6 @@ import numpy as np
 import plotly.express as px
 import plotly.graph_objects as go
 from streamlit_option_menu import option_menu
-import mysql.connector
 from mysql_con import get_connection, fetch_table_data
 import base64
 from PIL import Image
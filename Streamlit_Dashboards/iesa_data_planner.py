@@ -1,4 +1,3 @@
-import mysql.connector
 import pandas as pd
 import streamlit as st
 import os
@@ -15,6 +14,8 @@ from reportlab.lib.utils import ImageReader
 import math
 from textwrap import wrap
 from utils.logger import setup_logger
+from utils.db import list_tables
+from utils.table_cache import aggregate_table, read_table
 
 # Setup logger
 logger = setup_logger("iesa_data_planner")
@@ -416,23 +417,9 @@ def add_chart(chart_path):
 def create_pdf(chart_paths=None, user_actions=None):
     # First, create real charts from the database and save them
     try:
-        # Connect to the database and fetch actual data
-        conn = get_connection()
-        cursor = conn.cursor()
-        
-        # Query to get data from annual_electricity_data table
-        query = "SELECT * FROM annual_electricity_data"
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        
-        # Get column names
-        column_names = [desc[0] for desc in cursor.description]
-        
-        # Create DataFrame
-        electricity_data = pd.DataFrame(rows, columns=column_names)
-        
-        # Close connection
-        conn.close()
+        # Fetch actual data from the annual_electricity_data table
+        electricity_data = read_table("annual_electricity_data")
+        column_names = list(electricity_data.columns)
         
         # Create folder for chart images if it doesn't exist
         chart_folder = "chart_images"
@@ -714,24 +701,10 @@ def format_large_number(num):
         return f"{locale.format_string('%d', num // 1_000)} thousand"
     return locale.format_string('%d', num)
 
-# Connection
-def get_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        port="3306",
-        user="root",
-        passwd="admin123",
-        db="iesa_db"
-    )
-
 # Function to fetch tables from the database
 def fetch_tables():
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SHOW TABLES")
-        tables = [table[0] for table in cursor.fetchall()]
-        conn.close()
+        tables = list_tables()
         logger.info(f"Fetched tables: {tables}")
         return tables
     except Exception as e:
@@ -742,13 +715,7 @@ def fetch_tables():
 # Function to fetch data from a specific table
 def fetch_table_data(table_name):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        query = f"SELECT * FROM {table_name}"
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        data = pd.DataFrame(rows, columns=[desc[0] for desc in cursor.description])
-        conn.close()
+        data = read_table(table_name)
         logger.info(f"Fetched data for table: {table_name}, {len(data)} rows")
         return data
     except Exception as e:
@@ -1264,30 +1231,33 @@ if selected_table:
 if st.session_state["metrics"]:
     metric_buttons_html = '<div class="metric-buttons">'
 
+    # Every metric of a table is computed by the database in one query, cached until the table changes
+    metric_values = {}
+    for table in dict.fromkeys(table for table, _, _ in st.session_state["metrics"]):
+        try:
+            metric_values[table] = aggregate_table(
+                table, [(column, metric_type) for t, column, metric_type in st.session_state["metrics"] if t == table]
+            )
+        except Exception as e:
+            logger.error(f"Error computing metrics for {table}: {e}")
+            st.toast("Error computing metrics!", icon="❌")
+
     for metric in st.session_state["metrics"]:
         table, column, metric_type = metric
-        metric_data = fetch_table_data(table)
+        if table not in metric_values:
+            continue
+        result = int(metric_values[table][(column, metric_type)])
+        formatted_result = format_large_number(result)
+        metric_label = f"{column}:"
 
         if metric_type == "Sum":
-            result = int(metric_data[column].sum())
-            formatted_result = format_large_number(result)
             button_class = "sum-button"
-            metric_label = f"{column}:"
         elif metric_type == "Count":
-            result = int(metric_data[column].count())
-            formatted_result = format_large_number(result)
             button_class = "count-button"
-            metric_label = f"{column}:"
         elif metric_type == "Average":
-            result = int(metric_data[column].mean())
-            formatted_result = format_large_number(result)
             button_class = "total-button"
-            metric_label = f"{column}:"
         elif metric_type == "Unique":
-            result = int(metric_data[column].nunique())
-            formatted_result = format_large_number(result)
             button_class = "unique-button"
-            metric_label = f"{column}:"
 
         metric_buttons_html += f'<button class="{button_class}">{metric_label} {formatted_result}</button>'
 
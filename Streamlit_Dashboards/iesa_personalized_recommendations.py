@@ -1,7 +1,6 @@
 import streamlit as st
 import asyncio
 import pandas as pd
-import mysql.connector
 from pydantic_ai import Agent
 from pydantic_ai.models.groq import GroqModel
 from pydantic_ai.providers.groq import GroqProvider
@@ -15,6 +14,8 @@ from reportlab.lib import colors
 from reportlab.lib.utils import ImageReader
 from textwrap import wrap
 from utils.logger import setup_logger
+from utils.db import PRIVATE_TABLES, get_connection, list_tables
+from utils.table_cache import read_table
 
 # Setup logger
 logger = setup_logger("iesa_personalized_recommendations")
@@ -600,22 +601,9 @@ def get_model():
             continue
     return None
 
-def get_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        port="3306",
-        user="root",
-        passwd="admin123",
-        db="iesa_db"
-    )
-
 def fetch_tables():
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SHOW TABLES")
-        tables = [table[0] for table in cursor.fetchall() if table[0] != "user_data"]
-        conn.close()
+        tables = list_tables(exclude=PRIVATE_TABLES)
         return tables
     except Exception as e:
         st.error(f"Error fetching tables: {e}")
@@ -623,14 +611,7 @@ def fetch_tables():
 
 def fetch_table_data(table_name):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        query = f"SELECT * FROM {table_name}"
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        data = pd.DataFrame(rows, columns=[desc[0] for desc in cursor.description])
-        conn.close()
-        return data
+        return read_table(table_name)
     except Exception as e:
         st.error(f"Error fetching data from {table_name}: {e}")
         return pd.DataFrame()
@@ -1,4 +1,3 @@
-import mysql.connector
 import pandas as pd
 import streamlit as st
 from streamlit_option_menu import option_menu
@@ -19,6 +18,8 @@ from reportlab.lib.utils import ImageReader
 from textwrap import wrap
 import math
 from utils.logger import setup_logger
+from utils.db import list_tables
+from utils.table_cache import read_table
 
 # Setup logger
 logger = setup_logger("iesa_prediction_engine")
@@ -447,23 +448,10 @@ if "chart_paths" not in st.session_state:
     st.session_state.chart_paths = []
 
 # Database connection
-def get_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        port="3306",
-        user="root",
-        passwd="admin123",
-        db="iesa_db"
-    )
-
 # Fetch tables
 def fetch_tables():
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SHOW TABLES")
-        tables = [table[0] for table in cursor.fetchall()]
-        conn.close()
+        tables = list_tables()
         return tables
     except Exception as e:
         st.error(f"Error fetching tables: {e}")
@@ -471,11 +459,7 @@ def fetch_tables():
 
 # Fetch table data
 def fetch_table_data(table_name):
-    conn = get_connection()
-    query = f"SELECT * FROM {table_name}"
-    data = pd.read_sql(query, conn)
-    conn.close()
-    return data
+    return read_table(table_name)
 
 # Ensure X column is numeric
 def preprocess_x_column(data, x_column):
@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-import mysql.connector
 import groq
 import altair as alt
 from smolagents import Tool
@@ -16,6 +15,7 @@ from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.platypus import Paragraph, Spacer
 from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_JUSTIFY
 from utils.logger import setup_logger
+from utils.db import get_connection
 
 # Setup logger
 logger = setup_logger("iesa_scenerio_analysis")
@@ -87,15 +87,6 @@ st.set_page_config(
 )
 
 # Database connection
-def get_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        port="3306",
-        user="root",
-        passwd="admin123",
-        db="iesa_db"
-    )
-
 # Fetch Scenarios from Database
 def fetch_scenarios():
     conn = get_connection()
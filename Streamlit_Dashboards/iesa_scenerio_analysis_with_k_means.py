@@ -1,6 +1,5 @@
 import streamlit as st
 import pandas as pd
-import mysql.connector
 import groq
 import altair as alt
 from streamlit_option_menu import option_menu
@@ -10,6 +9,7 @@ from sklearn.preprocessing import StandardScaler
 import numpy as np
 from sklearn.decomposition import PCA
 import os
+from utils.db import get_connection
 
 # Initialize sidebar state
 if 'sidebar_state' not in st.session_state:
@@ -131,15 +131,6 @@ def auto_hide_sidebar_no_rerun():
 
 
 # Database connection
-def get_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        port="3306",
-        user="root",
-        passwd="admin123",
-        db="iesa_db"
-    )
-
 # Fetch Scenarios from Database
 def fetch_scenarios():
     conn = get_connection()
@@ -1,12 +1,18 @@
 import pandas as pd
-from itertools import combinations
-import mysql.connector
 import streamlit as st
 import numpy as np
 import traceback
 from streamlit_option_menu import option_menu
 import os
 from utils.logger import setup_logger
+from utils.db import get_connection, list_tables
+from utils.table_cache import read_table
+from utils.wisrule import WisRuleWithNegative, COUNTING_ENGINES, MINING_ALGORITHMS, ITEMSET_MODES, transaction_increment, transaction_fingerprint, wisrule_cache
+from utils.wisrule_contexts import CONTEXT_PARTITIONS, mine_contexts, partition_transactions
+from utils.wisrule_store import ensure_store_tables, load_rules, run_key, save_rules
+from utils.wisrule_index import RuleIndex
+from utils.wisrule_transactions import (MINING_COLUMNS, create_yoy_transactions_vectorized,
+                                        create_dimension_transactions_vectorized, prepare_mining_frame)
 
 # Setup logger
 logger = setup_logger("iesa_wisdom_mining")
@@ -19,6 +25,15 @@ if 'transactions' not in st.session_state:
     st.session_state.transactions = None
 if 'run_analysis' not in st.session_state:
     st.session_state.run_analysis = False
+if 'wisrule' not in st.session_state:
+    st.session_state.wisrule = None
+    st.session_state.wisrule_params = None
+if 'mined_run' not in st.session_state:
+    # (run key, miner, rules, rule index) of the run shown last, reused by reruns that keep its parameters
+    st.session_state.mined_run = None
+if 'context_index' not in st.session_state:
+    st.session_state.context_index = None
+    st.session_state.context_params = None
 
 st.set_page_config(page_title="WisRule Mining Algorithm", layout="wide", page_icon="📊")
 
@@ -434,310 +449,52 @@ st.sidebar.image(image_path,width=150)
 st.markdown("""
     <h2>Wisdom Mining Dashboard</h2>
 """,unsafe_allow_html=True)
-# Connection
-def get_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        port="3306",
-        user="root",
-        passwd="admin123",
-        db="iesa_db"
-    )
-
-class WisRuleWithNegative:
-    def __init__(self, transactions, min_support=0.15, min_confidence=0.3, min_utility=0.1):
-        self.transactions = transactions
-        self.min_support = min_support
-        self.min_confidence = min_confidence
-        self.min_utility = min_utility
-        self.item_support = {}
-        self.rules = []
-        self.total_transactions = len(transactions)
-        # Dictionary to store utility metrics for calculations
-        self.utility_dict = {
-            "transaction_count": self.total_transactions,
-            "item_counts": {},
-            "itemset_counts": {}
-        }
-
-    def generate_frequent_itemsets(self):
-        item_counts = {}
-        total_transactions = self.total_transactions
-          # Count occurrences of each item
-        for transaction in self.transactions:
-            for item in transaction:
-                item_counts[frozenset([item])] = item_counts.get(frozenset([item]), 0) + 1
-                
-        # Store item counts in utility dictionary for later use
-        self.utility_dict["item_counts"] = {next(iter(item)): count for item, count in item_counts.items()}
-        
-        # Filter by minimum support
-        self.item_support = {
-            item: count / total_transactions
-            for item, count in item_counts.items()
-            if count / total_transactions >= self.min_support
-        }
-        
-        current_itemsets = list(self.item_support.keys())
-        k = 2
-        
-        # Generate larger itemsets iteratively
-        while current_itemsets:
-            new_candidates = [
-                i.union(j) for i in current_itemsets for j in current_itemsets
-                if len(i.union(j)) == k
-            ]
-            candidate_counts = {candidate: 0 for candidate in new_candidates}
-            
-            # Count occurrences of each candidate itemset
-            for transaction in self.transactions:
-                transaction_set = frozenset(transaction)
-                for candidate in new_candidates:
-                    if candidate.issubset(transaction_set):
-                        candidate_counts[candidate] += 1
-                        
-            # Store itemset counts in utility dictionary
-            for candidate, count in candidate_counts.items():
-                if len(candidate) > 1:
-                    self.utility_dict["itemset_counts"][frozenset(candidate)] = count
-                    
-            current_itemsets = []
-            for candidate, count in candidate_counts.items():
-                support = count / total_transactions
-                if support >= self.min_support:
-                    self.item_support[candidate] = support
-                    current_itemsets.append(candidate)
-            k += 1
-
-    def generate_rules(self):
-        self.rules = []
-        for itemset in self.item_support.keys():
-            if len(itemset) > 1:
-                for subset in self.powerset(itemset):
-                    if subset and subset != itemset:
-                        antecedent = frozenset(subset)
-                        consequent = itemset - antecedent
-                        self.evaluate_rule(antecedent, consequent, positive=True)
-                        self.evaluate_rule(antecedent, consequent, positive=False)
-
-    def calculate_upii(self, antecedent, consequent, positive=True):
-        """Calculate Utility-based Probabilistic Interestingness Index (UPII)"""
-        ant_support = self.item_support.get(antecedent, 0)
-        cons_support = self.item_support.get(consequent, 0)
-        
-        if not positive:
-            cons_support = 1 - cons_support
-            
-        if ant_support == 0 or cons_support == 0:
-            return 0
-            
-        # Calculate joint probability
-        joint_prob = 0
-        if positive:
-            joint_prob = self.utility_dict.get("itemset_counts", {}).get(
-                frozenset(antecedent.union(consequent)), 0
-            ) / self.total_transactions
-        else:
-            # For negative rules, calculate differently
-            negation_count = 0
-            for transaction in self.transactions:
-                if antecedent.issubset(transaction) and not consequent.issubset(transaction):
-                    negation_count += 1
-            joint_prob = negation_count / self.total_transactions
-            
-        # Calculate UPII
-        expected_prob = ant_support * cons_support
-        return (joint_prob - expected_prob) / max(joint_prob, expected_prob) if max(joint_prob, expected_prob) > 0 else 0
-
-    def calculate_lift(self, antecedent, consequent, positive=True):
-        """Calculate lift/interestingness"""
-        ant_support = self.item_support.get(antecedent, 0)
-        cons_support = self.item_support.get(consequent, 0)
-        
-        if not positive:
-            cons_support = 1 - cons_support
-            
-        if ant_support == 0 or cons_support == 0:
-            return 0
-            
-        # Calculate joint probability
-        joint_prob = 0
-        if positive:
-            joint_prob = self.utility_dict.get("itemset_counts", {}).get(
-                frozenset(antecedent.union(consequent)), 0
-            ) / self.total_transactions
-        else:
-            # For negative rules
-            negation_count = 0
-            for transaction in self.transactions:
-                if antecedent.issubset(transaction) and not consequent.issubset(transaction):
-                    negation_count += 1
-            joint_prob = negation_count / self.total_transactions
-            
-        # Calculate lift
-        return joint_prob / (ant_support * cons_support) if (ant_support * cons_support) > 0 else 0
-
-    def calculate_wisval(self, confidence, lift, upii):
-        """Calculate WisVal - Wisdom Value metric"""
-        # Weighted combination of confidence, lift and UPII
-        return (0.4 * confidence) + (0.3 * lift) + (0.3 * upii)
-        
-    def evaluate_rule(self, antecedent, consequent, positive=True):
-        if not consequent:
-            return
-            
-        antecedent_support = self.item_support.get(antecedent, 0)
-        consequent_support = self.item_support.get(consequent, 0)
-        
-        # Calculate confidence
-        if positive:
-            confidence = antecedent_support
-            rule_type = "Positive"
-            complement_support = consequent_support
-        else:
-            complement_support = 1 - consequent_support
-            confidence = antecedent_support * complement_support
-            rule_type = "Negative"
-            
-        # Calculate traditional utility
-        if positive:
-            utility = confidence / consequent_support if consequent_support > 0 else 0
-        else:
-            utility = confidence / complement_support if complement_support > 0 else 0
-            
-        # Calculate advanced metrics
-        lift = self.calculate_lift(antecedent, consequent, positive)
-        upii = self.calculate_upii(antecedent, consequent, positive)
-        wisval = self.calculate_wisval(confidence, lift, upii)
-        
-        # Only add rules that meet the minimum thresholds
-        if confidence >= self.min_confidence and utility >= self.min_utility:
-            rule = (antecedent, "¬" if not positive else "", consequent, confidence, 
-                   rule_type, utility, lift, upii, wisval)
-            self.rules.append(rule)
-
-    def get_rules(self):
-        return self.rules
-
-    @staticmethod
-    def powerset(itemset):
-        return [set(comb) for i in range(1, len(itemset)) for comb in combinations(itemset, i)]
-
 # Data fetching function
 def fetch_data_from_db(table_name="annual_electricity_data"):
     try:
         with st.spinner(f'Connecting to database table {table_name}...'):
-            conn = get_connection()
-            cursor = conn.cursor()
-            query = f"SELECT * FROM `{table_name}`"
-            cursor.execute(query)
-            rows = cursor.fetchall()
-            if not rows:
+            data = read_table(table_name)
+            if data.empty:
                 return pd.DataFrame()
-            columns = [desc[0] for desc in cursor.description]
-            data = pd.DataFrame(rows, columns=columns)
-
-            # Optional conversion if Installed Capacity (MW) exists
-            if "Installed Capacity (MW)" in data.columns:
-                data["Installed Capacity (MW)"] = (data["Installed Capacity (MW)"] * 8760) / 1000
-                data.rename(columns={"Installed Capacity (MW)": "Installed Capacity (GWh)"}, inplace=True)
-
-            for col in data.columns[1:]:
-                data[col] = pd.to_numeric(data[col], errors="coerce")
-            data.fillna(0, inplace=True)
+            data = prepare_mining_frame(data)
     except Exception as e:
         st.error(f"Error: {e}")
         st.error(traceback.format_exc())
         data = pd.DataFrame()
-    finally:
-        conn.close()
     return data
 
-# Optional helper for year-over-year labels
-def categorize_yoy(current_value, previous_value, label):
-    if previous_value is None:
-        return f"Initial {label}" if current_value > 0 else f"Low {label}"
-    if current_value > previous_value:
-        return f"High {label} (↑)"
-    elif current_value < previous_value:
-        return f"Low {label} (↓)"
-    else:
-        return f"Stable {label} (→)"
-
-# Transaction creation from YOY analysis
-def create_yoy_transactions(df, columns):
-    year_col = None
-    for col in df.columns:
-        if 'year' in col.lower():
-            year_col = col
-            df = df.sort_values(by=year_col)
-            break
-            
-    transactions = []
-    previous_values = {col: None for col in columns}
-    column_names = []
-    
-    for idx, row in df.iterrows():
-        transaction = []
-        for col in columns:
-            if col in df.columns:
-                label = col.split(" ")[0]  # Extract the label part (e.g., "Imports" from "Imports (GWh)")
-                current_value = row[col]
-                previous_value = previous_values[col]
-                
-                # Categorize based on year-over-year comparison
-                category = categorize_yoy(current_value, previous_value, label)
-                transaction.append(category)
-                
-                # Update previous value for the next iteration
-                previous_values[col] = current_value
-                
-                # Store column name for first row
-                if len(column_names) < len(columns):
-                    column_names.append(col)
-        
-        # Add year information if available
-        if year_col:
-            transaction.append(f"Year: {row[year_col]}")
-            if len(column_names) < len(columns) + 1:
-                column_names.append("Year")
-                
-        transactions.append(transaction)
-    
-    return transactions, column_names
-
 # Optional secondary table fetch
 def fetch_table(table_name):
-    conn = get_connection()
-    df = pd.read_sql(f"SELECT * FROM {table_name}", conn)
-    conn.close()
-    return df
+    return read_table(table_name)
 
-# Create transactions from utility/location dimensions
-def create_dimension_transactions(location_df, utility_df):
-    transactions = []
-    for i in range(len(location_df)):
-        row = []
-        location = location_df.iloc[i].get("Province") or location_df.iloc[i].get("Region")
-        if location:
-            row.append(f"Location: {location}")
-        year = location_df.iloc[i].get("Year")
-        if year:
-            row.append(f"Year: {year}")
-        for col in utility_df.columns[1:]:
-            val = utility_df.iloc[i][col]
-            if pd.notna(val):
-                row.append(f"Utility: {col}")
-        transactions.append(row)
-    return transactions
+# Precomputed rules of a run from the wisrule_results store, None when absent or unreachable
+def load_stored_rules(key):
+    try:
+        conn = get_connection()
+        try:
+            ensure_store_tables(conn)
+            return load_rules(conn, key)
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning(f"WisRule store lookup failed: {e}")
+        return None
 
-def fetch_tables():
+# Persist a run so repeat visits with the same data and parameters skip mining
+def store_rules(key, rules, dataset_version, params):
     try:
         conn = get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SHOW TABLES")
-        tables = [table[0] for table in cursor.fetchall()]
-        conn.close()
+        try:
+            ensure_store_tables(conn)
+            save_rules(conn, key, rules, dataset_version, params)
+        finally:
+            conn.close()
+    except Exception as e:
+        logger.warning(f"WisRule store write failed: {e}")
+
+def fetch_tables():
+    try:
+        tables = list_tables()
         return tables
     except Exception as e:
         print(f"Error fetching tables: {e}")
@@ -765,6 +522,40 @@ if st.session_state.df is not None:
     min_support = st.sidebar.slider("Minimum Support", 0.0, 1.0, 0.3, 0.01)
     min_confidence = st.sidebar.slider("Minimum Confidence", 0.0, 1.0, 0.5, 0.01)
     min_utility = st.sidebar.slider("Minimum Utility", 0.0, 1.0, 0.1, 0.01)
+    counting_engine = st.sidebar.selectbox("Counting Engine", COUNTING_ENGINES, index=0,
+                                           help="Bitset counts itemset support with bitwise AND + popcount over packed item columns, "
+                                                "mmap streams chunks of an on-disk incidence matrix so memory stays bounded")
+    mining_algorithm = st.sidebar.selectbox("Mining Algorithm", MINING_ALGORITHMS, index=0,
+                                            help="FP-Growth mines frequent itemsets from an FP-tree without enumerating infrequent candidates")
+    if counting_engine == "mmap" and mining_algorithm != "apriori":
+        st.sidebar.warning("The mmap engine counts candidates level by level, mining with Apriori instead")
+        mining_algorithm = "apriori"
+    itemset_mode = st.sidebar.selectbox("Itemset Output", ITEMSET_MODES, index=0,
+                                        help="Closed drops itemsets with an equal-support superset, maximal keeps only itemsets without a frequent superset")
+    rule_workers = st.sidebar.number_input("Rule Workers", min_value=1, max_value=os.cpu_count() or 1, value=1,
+                                           help="Processes used to evaluate rules, 1 keeps evaluation serial")
+    top_rules_only = st.sidebar.checkbox("Mine Top Rules Only", value=False,
+                                         help="Keep only the best rules by WisVal, skipping itemsets that cannot reach them")
+    top_k = st.sidebar.number_input("Number of Top Rules", min_value=1, max_value=1000, value=12,
+                                    disabled=not top_rules_only)
+    approximate_mode = st.sidebar.checkbox("Approximate (Sampled) Mining", value=False,
+                                           help="Mine a random sample at a Hoeffding-lowered support so slider tuning stays fast on large data")
+    sample_size = st.sidebar.number_input("Sample Size", min_value=100, max_value=1000000, value=2000, step=100,
+                                          disabled=not approximate_mode)
+    verify_sample = st.sidebar.checkbox("Verify Sampled Itemsets", value=False, disabled=not approximate_mode,
+                                        help="Exact pass over all transactions confirming the itemsets found in the sample")
+    with st.sidebar.expander("Mining Budgets"):
+        # Low supports can explode the candidate count, these stop mining at the deepest completed level
+        max_length = st.number_input("Max Itemset Length", min_value=0, max_value=50, value=0,
+                                     help="0 leaves the itemset length unbounded")
+        time_budget = st.number_input("Time Limit (seconds)", min_value=0.0, max_value=3600.0, value=30.0, step=5.0,
+                                      help="0 disables the wall-clock limit")
+        max_candidates = st.number_input("Max Candidates", min_value=0, max_value=100000000, value=1000000, step=10000,
+                                         help="Total candidate itemsets counted before stopping, 0 disables the limit")
+    budgets = dict(max_length=max_length or None, time_budget=time_budget or None,
+                   max_candidates=max_candidates or None)
+    context_partition = st.sidebar.selectbox("Rule Contexts", ["None"] + list(CONTEXT_PARTITIONS), index=0,
+                                             help="Also mine each decade, year or location separately to find stable and contrast rules")
     
     # Advanced Parameter Explanation
     with st.sidebar.expander("Advanced WisRule Metrics"):
@@ -797,7 +588,7 @@ if st.session_state.df is not None:
     st.dataframe(st.session_state.df)
     
     # Check if we have required columns
-    required_columns = ["Installed Capacity (GWh)", "Generation (GWh)", "Imports (GWh)", "Consumption (GWh)"]
+    required_columns = list(MINING_COLUMNS)
     missing_columns = [col for col in required_columns if col not in st.session_state.df.columns]
     
     if missing_columns:
@@ -817,14 +608,14 @@ if st.session_state.df is not None:
             st.session_state.df[col] = pd.to_numeric(st.session_state.df[col], errors='coerce')
     
     # Create transactions with year-over-year comparison
-    st.session_state.transactions, column_names = create_yoy_transactions(st.session_state.df, required_columns)
+    st.session_state.transactions, column_names = create_yoy_transactions_vectorized(st.session_state.df, required_columns)
 
       # Add dimension-based transactions if selected
     if use_dimensions:
         try:
             location_df = fetch_table(selected_location_table)
             utility_df = fetch_table(selected_utility_table)
-            dimension_transactions = create_dimension_transactions(location_df, utility_df)
+            dimension_transactions = create_dimension_transactions_vectorized(location_df, utility_df)
             st.session_state.transactions.extend(dimension_transactions)
             st.success("Dimension-based transactions added.")
         except Exception as e:
@@ -855,14 +646,176 @@ if st.session_state.df is not None:
 
 if st.session_state.run_analysis:
     with st.spinner('Running WisRule Algorithm...'):
-        wisrule = WisRuleWithNegative(
-            transactions=st.session_state.transactions,
-            min_support=min_support,
-            min_confidence=min_confidence
-        )
-        wisrule.generate_frequent_itemsets()
-        wisrule.generate_rules()
-        rules = wisrule.get_rules()
+        sampling = dict(sample_size=sample_size, verify_sample=verify_sample, sample_seed=0) if approximate_mode else {}
+        # Only parameters that change the rules go into the store key, engines and workers do not
+        dataset_version = transaction_fingerprint(st.session_state.transactions)
+        store_params = dict(min_support=min_support, min_confidence=min_confidence, min_utility=min_utility,
+                            mining_algorithm=mining_algorithm, itemset_mode=itemset_mode,
+                            top_k=int(top_k) if top_rules_only else None, **sampling)
+        store_key = run_key(dataset_version, store_params)
+        wisrule = None
+        rules = None
+        rule_index = None
+        newly_mined = False
+        wisrule_params = (min_support, min_confidence, min_utility, counting_engine, mining_algorithm, itemset_mode)
+        # Budgets only shape truncated runs, which are redone once a budget is raised
+        shown_key = (store_key, counting_engine, tuple(sorted(budgets.items())))
+        if st.session_state.mined_run is not None and st.session_state.mined_run[0] == shown_key:
+            # Reruns from widgets outside the mining parameters, e.g. the rule search, reuse the shown run
+            _, wisrule, rules, rule_index = st.session_state.mined_run
+        elif not top_rules_only and not approximate_mode:
+            # Reuse the last mining run when only new transactions (e.g. a new fiscal year) were appended
+            wisrule = st.session_state.wisrule
+            new_transactions = None
+            # A run cut short by its budget has no complete counts to extend
+            if wisrule is not None and not wisrule.truncated and st.session_state.wisrule_params == wisrule_params:
+                new_transactions = transaction_increment(wisrule.transactions, st.session_state.transactions)
+
+            if new_transactions is None:
+                # Slider moves above an earlier run's thresholds are answered by filtering the cached run
+                wisrule = wisrule_cache.lookup((dataset_version, itemset_mode), min_support, min_confidence,
+                                               min_utility)
+            elif new_transactions:
+                logger.info(f"Updating WisRule results with {len(new_transactions)} new transactions")
+                wisrule.rule_workers = rule_workers
+                wisrule.update(new_transactions)
+                # The increment is appended regrouped, so key the run by the page's own transaction order
+                wisrule_cache.store(wisrule, (dataset_version, itemset_mode))
+                newly_mined = True
+
+        # Unverified sampled runs are cheap and inexact, so they are neither looked up nor stored
+        if wisrule is None and rules is None and not (approximate_mode and not verify_sample):
+            rules = load_stored_rules(store_key)
+            if rules is not None:
+                st.toast("Rules loaded from the rule store", icon="💾")
+
+        if wisrule is None and rules is None:
+            newly_mined = True
+            if top_rules_only:
+                # Bound-pruned top-k mining, the heap never holds more than top_k rules
+                wisrule = WisRuleWithNegative(
+                    transactions=st.session_state.transactions,
+                    min_support=min_support,
+                    min_confidence=min_confidence,
+                    min_utility=min_utility,
+                    counting_engine=counting_engine,
+                    mining_algorithm=mining_algorithm,
+                    itemset_mode=itemset_mode,
+                    **sampling,
+                    **budgets
+                )
+                wisrule.generate_frequent_itemsets()
+                wisrule.generate_top_rules(top_k)
+            elif approximate_mode:
+                # Sampled runs are cheap to redo and never cached next to exact ones
+                wisrule = WisRuleWithNegative(
+                    transactions=st.session_state.transactions,
+                    min_support=min_support,
+                    min_confidence=min_confidence,
+                    min_utility=min_utility,
+                    counting_engine=counting_engine,
+                    mining_algorithm=mining_algorithm,
+                    rule_workers=rule_workers,
+                    itemset_mode=itemset_mode,
+                    **sampling,
+                    **budgets
+                )
+                wisrule.generate_frequent_itemsets()
+                wisrule.generate_rules()
+            else:
+                wisrule = wisrule_cache.mine(
+                    st.session_state.transactions,
+                    min_support=min_support,
+                    min_confidence=min_confidence,
+                    min_utility=min_utility,
+                    counting_engine=counting_engine,
+                    mining_algorithm=mining_algorithm,
+                    rule_workers=rule_workers,
+                    itemset_mode=itemset_mode,
+                    **budgets
+                )
+
+        if wisrule is not None and not top_rules_only and not approximate_mode:
+            # Later appends are folded into this run instead of mining again
+            st.session_state.wisrule = wisrule
+            st.session_state.wisrule_params = wisrule_params
+
+        if wisrule is not None:
+            if rules is None:
+                rules = wisrule.get_rules()
+            if wisrule.truncated and wisrule.truncation_reason == "rule_deadline":
+                st.warning("Rule generation ran out of time after every itemset level was mined. Rules are partial, "
+                           "raise the thresholds or the Time Limit to derive them all.")
+            elif wisrule.truncated:
+                st.warning(f"Mining stopped early ({wisrule.truncation_reason.replace('_', ' ')}) after completing "
+                           f"itemset level {wisrule.completed_level}. Rules are partial, raise the thresholds or "
+                           f"the Mining Budgets to mine further.")
+            elif newly_mined and (not wisrule.approximate or wisrule.verified):
+                # Only fresh runs are written, cache hits and reruns are already stored
+                store_rules(store_key, rules, dataset_version, store_params)
+
+            # Candidates counted and pruned at each itemset level
+            with st.expander("Mining Levels"):
+                st.dataframe(pd.DataFrame(wisrule.level_stats))
+                st.caption(f"Rules derived from {len(wisrule.rule_itemsets())} {itemset_mode} itemsets")
+
+            if wisrule.rules:
+                # Each rule rescored with the size-weighted utility of its itemsets, one vectorized pass over all rules
+                with st.expander("Utility-Weighted Scores"):
+                    full_metrics = pd.DataFrame([{
+                        "Antecedent": ", ".join(metrics["antecedent"]),
+                        "Consequent": f"{rule[1]}{', '.join(metrics['consequent'])}",
+                        "Support": metrics["support"],
+                        "Utility": metrics["utility"],
+                        "Interestingness": metrics["interestingness"],
+                        "WisVal": metrics["wisval"]
+                    } for rule, metrics in zip(wisrule.rules, wisrule.full_rule_metrics())])
+                    st.dataframe(full_metrics.sort_values("WisVal", ascending=False))
+        if rule_index is None and rules:
+            # Built once per shown run, the rule search only queries it on each keystroke
+            rule_index = RuleIndex(rules)
+        st.session_state.mined_run = (shown_key, wisrule, rules, rule_index)
+
+        if context_partition != "None":
+            # Contexts are mined once per transaction set and parameters, then answered from the index
+            context_params = (transaction_fingerprint(st.session_state.transactions), context_partition, min_support,
+                              min_confidence, min_utility, counting_engine, mining_algorithm, itemset_mode)
+            if st.session_state.context_params != context_params:
+                prefix, group = CONTEXT_PARTITIONS[context_partition]
+                st.session_state.context_index = mine_contexts(
+                    partition_transactions(st.session_state.transactions, prefix, group),
+                    min_support=min_support,
+                    min_confidence=min_confidence,
+                    min_utility=min_utility,
+                    workers=rule_workers,
+                    counting_engine=counting_engine,
+                    mining_algorithm=mining_algorithm,
+                    itemset_mode=itemset_mode,
+                    **budgets
+                )
+                st.session_state.context_params = context_params
+            context_index = st.session_state.context_index
+
+            with st.expander(f"Rules Across Contexts ({context_partition})"):
+                if not context_index.contexts:
+                    st.info(f"No transactions carry a {context_partition.lower()} to partition by")
+                else:
+                    def context_rule_rows(keys):
+                        return pd.DataFrame([{
+                            "Antecedent": ", ".join(antecedent),
+                            "Consequent": f"{negation}{', '.join(consequent)}",
+                            "Contexts": ", ".join(map(str, context_index.contexts_of(antecedent, consequent, negation)))
+                        } for antecedent, negation, consequent in keys])
+
+                    min_share = st.slider("Hold in at least this share of contexts", 0.1, 1.0, 1.0, 0.05)
+                    stable = context_index.stable_rules(min_share=min_share)
+                    st.subheader(f"Stable Rules ({len(stable)})")
+                    st.dataframe(context_rule_rows(stable))
+
+                    contrast_context = st.selectbox("Contrast Context", context_index.contexts)
+                    contrast = context_index.contrast_rules(contrast_context)
+                    st.subheader(f"Rules Only In {contrast_context} ({len(contrast)})")
+                    st.dataframe(context_rule_rows(contrast))
         
         if not rules:
             st.warning("No rules meet the support and confidence thresholds. Try lowering the thresholds.")
@@ -884,6 +837,11 @@ if st.session_state.run_analysis:
                 })
             
             rule_df = pd.DataFrame(rule_data)
+            if wisrule is not None and wisrule.approximate:
+                # Unverified sampled supports are only known to within the Hoeffding error
+                rule_df["Approximate"] = "verified" if wisrule.verified else f"± {wisrule.support_error:.3f}"
+                st.info(f"Approximate results mined from a sample of {wisrule.sample_size} of "
+                        f"{len(wisrule.population)} transactions")
             
             # Sort rules by WisVal for better insights (highest WisVal first)
             rule_df["WisVal"] = pd.to_numeric(rule_df["WisVal"])
@@ -894,7 +852,23 @@ if st.session_state.run_analysis:
             
             with tabs[0]:
                 st.subheader("All Discovered Rules")
-                st.dataframe(rule_df)
+                # Rule ids of the index are the row labels of rule_df, so matches keep the WisVal order
+                search_col, side_col, wisval_col = st.columns([3, 2, 1])
+                with search_col:
+                    search_text = st.text_input("Search Rules by Item", placeholder="e.g. Low Imports")
+                with side_col:
+                    search_side = st.radio("Item Appears In", ["Anywhere", "Antecedent", "Consequent"], horizontal=True)
+                with wisval_col:
+                    min_wisval = st.number_input("Minimum WisVal", value=float(rule_index.metrics["wisval"].min()),
+                                                 step=0.05)
+                search_items = rule_index.find_items(search_text) if search_text.strip() else []
+                item_filter = {{"Anywhere": "anywhere", "Antecedent": "antecedent", "Consequent": "consequent"}[search_side]: search_items}
+                matched_ids = rule_index.query(match_any=True, wisval=(min_wisval, None), **item_filter)
+                if search_text.strip() and not search_items:
+                    st.info(f"No rule item matches '{search_text}'")
+                    matched_ids = matched_ids[:0]
+                st.dataframe(rule_df[rule_df.index.isin(matched_ids)])
+                st.caption(f"{len(matched_ids)} of {len(rule_index)} rules")
                 
                 # Add download button for rules
                 st.download_button(
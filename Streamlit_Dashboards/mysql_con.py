@@ -1,14 +1,7 @@
-import mysql.connector
+import pandas as pd
+from utils.db import get_connection
+from utils.table_cache import read_table
 
-# Connection
-def get_connection():
-    return mysql.connector.connect(
-        host="localhost",
-        port="3306",
-        user="root",
-        passwd="admin123",
-        db="iesa_db"
-    )
 
 def custom_hash(input_string):
     hash_val=0
@@ -31,15 +24,9 @@ def validate_user(username, password):
 # Fetch data from a table - adding this function to resolve the import error
 def fetch_table_data(table_name):
     try:
-        conn = get_connection()
-        cursor = conn.cursor()
-        query = f"SELECT * FROM `{table_name}`"
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        if not rows:
+        data = read_table(table_name)
+        if data.empty:
             return pd.DataFrame()
-        columns = [desc[0] for desc in cursor.description]
-        data = pd.DataFrame(rows, columns=columns)
 
         # Convert MW to GWh if applicable
         if "Installed Capacity (MW)" in data.columns:
@@ -54,7 +41,5 @@ def fetch_table_data(table_name):
     except Exception as e:
         print(f"Error fetching data from {table_name}: {e}")
         data = pd.DataFrame()
-    finally:
-        conn.close()
     
     return data
\ No newline at end of file
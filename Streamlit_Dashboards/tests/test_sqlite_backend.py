@@ -0,0 +1,38 @@
+import pytest
+
+from utils import sqlite_backend
+from utils.sqlite_backend import translate
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("SELECT * FROM t WHERE a = %s AND b = %s", "SELECT * FROM t WHERE a = ? AND b = ?"),
+    ("SELECT * FROM t WHERE a LIKE '%s%' AND b = %s", "SELECT * FROM t WHERE a LIKE '%s%' AND b = ?"),
+    ("SELECT 'it''s %s', %s", "SELECT 'it''s %s', ?"),
+    ("SELECT 'a\\' %s', %s", "SELECT 'a\\' %s', ?"),
+    ('SELECT "%s" FROM `%s` WHERE x = %s', 'SELECT "%s" FROM `%s` WHERE x = ?'),
+    ("show tables;", sqlite_backend.SHOW_TABLES),
+])
+def test_translate_replaces_placeholders_only_outside_quotes(query, expected):
+    assert translate(query) == expected
+
+
+def test_literal_percent_s_survives_a_parameterised_query():
+    conn = sqlite_backend.connect(":memory:")
+    try:
+        cursor = conn.cursor()
+        cursor.execute("CREATE TABLE `t` (`a` TEXT, `b` INTEGER)")
+        cursor.executemany("INSERT INTO `t` (`a`, `b`) VALUES (%s, %s)", [("%s", 1), ("other", 2)])
+        cursor.execute("SELECT `b` FROM `t` WHERE `a` = '%s' OR `b` = %s ORDER BY `b`", (2,))
+        assert cursor.fetchall() == [(1,), (2,)]
+    finally:
+        conn.close()
+
+
+def test_default_dump_has_every_table_the_pages_read():
+    conn = sqlite_backend.connect(":memory:")
+    try:
+        sqlite_backend.load_dump(conn)
+        tables = {row[0] for row in conn.execute("SHOW TABLES")}
+    finally:
+        conn.close()
+    assert {"scenario_definitions", "annual_electricity_data", "user_data"} <= tables
@@ -0,0 +1,66 @@
+import datetime
+
+from utils import table_cache
+
+
+class FakeCursor:
+    def __init__(self, server):
+        self.server = server
+        self.rows = []
+
+    def execute(self, query, parameters=()):
+        self.server.queries.append(query)
+        if query.startswith("SELECT `table_name`, `version`"):
+            self.rows = [("readings", 3)]
+        elif "information_schema.TABLES" in query:
+            self.rows = [("readings", None), ("other", datetime.datetime(2026, 1, 2, 3, 4, 5))]
+        elif query.startswith("CHECKSUM TABLE"):
+            # The scan must not hold the lock every reader of every table waits on
+            self.server.lock_held_during_checksum = self.server.versions.lock.locked()
+            self.rows = [("readings", 1234)]
+
+    def fetchall(self):
+        return self.rows
+
+    def fetchone(self):
+        return self.rows[0]
+
+    def close(self):
+        pass
+
+
+class FakeServer:
+    def __init__(self, versions):
+        self.versions = versions
+        self.queries = []
+        self.lock_held_during_checksum = None
+
+    def connect(self):
+        server = self
+
+        class Connection:
+            def cursor(self):
+                return FakeCursor(server)
+
+            def close(self):
+                pass
+
+        return Connection()
+
+
+def test_mysql_versions_read_fresh_change_stamps_and_checksum_outside_the_lock(monkeypatch):
+    versions = table_cache.TableVersions(ttl=60)
+    server = FakeServer(versions)
+    monkeypatch.setattr(table_cache, "BACKEND", "mysql")
+    monkeypatch.setattr(table_cache, "get_connection", server.connect)
+    monkeypatch.setattr(table_cache, "ensure_tables", lambda conn, *statements: None)
+
+    assert versions.get("other") == "0-2026-01-02T03:04:05"
+    assert server.queries.index("SET SESSION information_schema_stats_expiry = 0") < \
+        next(idx for idx, query in enumerate(server.queries) if "information_schema.TABLES" in query)
+
+    assert versions.get("readings") == "3-checksum-1234"
+    assert server.lock_held_during_checksum is False
+    # Checksummed once, later reads reuse it while UPDATE_TIME stays unknown
+    assert versions.get("readings") == "3-checksum-1234"
+    assert sum(query.startswith("CHECKSUM TABLE") for query in server.queries) == 1
@@ -0,0 +1,147 @@
+import os
+import random
+import tempfile
+
+import numpy as np
+import pytest
+
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.wisrule import (WisRuleCache, WisRuleWithNegative, prune_incidence_files, read_incidence_file,
+                           transaction_fingerprint, transaction_increment, write_incidence_file)
+from utils.wisrule_benchmark import generate_yoy_transactions
+
+
+@pytest.fixture
+def transactions():
+    return generate_yoy_transactions(3000, seed=7)
+
+
+@pytest.fixture(autouse=True)
+def incidence_dir(tmp_path, monkeypatch):
+    # Default incidence files are shared through the temp dir, keep each test's apart
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+
+
+def rule_keys(miner):
+    return {(antecedent, negation, consequent) for antecedent, negation, consequent, *_ in miner.get_rules()}
+
+
+def mined_rules(transactions, **options):
+    miner = WisRuleWithNegative(transactions, 0.1, 0.3, 0.1, **options)
+    miner.generate_frequent_itemsets()
+    miner.generate_rules()
+    return rule_keys(miner)
+
+
+def test_verified_sample_matches_exact_run_with_reused_incidence_file(transactions):
+    # The exact run leaves the population's incidence file behind for verification to find
+    exact = mined_rules(transactions, counting_engine="mmap")
+    verified = mined_rules(transactions, counting_engine="mmap", sample_size=500, verify_sample=True, sample_seed=1)
+    assert verified == exact
+
+
+def test_cached_runs_survive_later_updates_of_the_stored_miner(transactions):
+    # Two increments applied the way the Wisdom Mining page applies them
+    cache = WisRuleCache()
+    first, second = generate_yoy_transactions(300, seed=8), generate_yoy_transactions(300, seed=9)
+    current = transactions
+    miner = cache.mine(current, 0.1, 0.3, 0.1)
+    for increment in (first, second):
+        current = current + increment
+        miner.update(transaction_increment(miner.transactions, current))
+        cache.store(miner, (transaction_fingerprint(current), "all"))
+
+    cached = cache.mine(transactions + first, 0.1, 0.3, 0.1)
+    assert cached.total_transactions == len(transactions) + len(first)
+    assert rule_keys(cached) == mined_rules(transactions + first)
+    assert rule_keys(cache.mine(current, 0.1, 0.3, 0.1)) == mined_rules(current)
+
+
+def test_cache_is_safe_across_threads(transactions):
+    cache = WisRuleCache(max_entries=2)
+    datasets = [transactions[:1000 + 100 * idx] for idx in range(6)]
+
+    def mine(idx):
+        return len(cache.mine(datasets[idx % len(datasets)], 0.1, 0.3, 0.1).get_rules())
+
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert all(count >= 0 for count in executor.map(mine, range(60)))
+
+
+@pytest.mark.parametrize("rule_workers", [1, 2])
+def test_rule_generation_stops_at_the_deadline(transactions, rule_workers):
+    miner = WisRuleWithNegative(transactions, 0.05, 0.1, 0.0, time_budget=60, rule_workers=rule_workers)
+    miner.generate_frequent_itemsets()
+    assert not miner.truncated
+    # Itemset mining finished within the budget, rule generation starts past the deadline
+    miner.budget.deadline = 0
+    miner.generate_rules()
+    assert miner.truncated and miner.truncation_reason == "rule_deadline"
+    assert len(miner.rules) < len(WisRuleCache().mine(transactions, 0.05, 0.1, 0.0).rules)
+
+
+def test_top_rules_stop_at_the_deadline(transactions):
+    miner = WisRuleWithNegative(transactions, 0.05, 0.1, 0.0, time_budget=60)
+    miner.generate_frequent_itemsets()
+    miner.budget.deadline = 0
+    assert miner.generate_top_rules(10) == []
+    assert miner.truncation_reason == "rule_deadline"
+
+
+
+def test_top_rules_at_zero_support_match_the_full_run():
+    # At a minimum support of 0 itemsets no transaction holds can reach rule generation
+    rng = random.Random(0)
+    small = [rng.sample("abcdef", rng.randint(1, 3)) for _ in range(30)]
+    full = WisRuleWithNegative(small, 0.0, 0.3, 0.1)
+    full.generate_frequent_itemsets()
+    full.generate_rules()
+    top = WisRuleWithNegative(small, 0.0, 0.3, 0.1)
+    top.generate_frequent_itemsets()
+    expected = sorted(rule[8] for rule in full.get_rules())[::-1][:5]
+    assert [rule[8] for rule in top.generate_top_rules(5)] == pytest.approx(expected)
+
+
+def test_incidence_file_refuses_one_shot_iterables(tmp_path, transactions):
+    with pytest.raises(TypeError):
+        write_incidence_file((transaction for transaction in transactions), str(tmp_path / "rows.npy"))
+
+
+def test_incidence_file_packs_the_same_bits_whatever_the_chunk_size(tmp_path, transactions):
+    # Odd chunk sizes start chunks mid-byte
+    transactions = transactions[:1003]
+    expected = None
+    for chunk_size in (13, 64, 1 << 16):
+        path = str(tmp_path / f"rows_{chunk_size}.npy")
+        write_incidence_file(transactions, path, chunk_size=chunk_size)
+        incidence, item_dictionary, total_transactions = read_incidence_file(path)
+        assert total_transactions == len(transactions)
+        if expected is None:
+            dense = np.zeros((len(item_dictionary), len(transactions)), dtype=bool)
+            for tid, transaction in enumerate(transactions):
+                for item in transaction:
+                    dense[item_dictionary.item_ids[item], tid] = True
+            expected = np.packbits(dense, axis=1)
+        assert np.array_equal(incidence, expected)
+
+
+def test_incidence_files_are_swapped_in_and_pruned_least_recently_used_first(tmp_path, transactions):
+    runs = [transactions[:500 + 100 * idx] for idx in range(4)]
+    for run in runs:
+        mined_rules(run, counting_engine="mmap")
+    # Only complete files are left, each with its sidecar
+    names = sorted(os.listdir(tmp_path))
+    assert not [name for name in names if name.endswith(".tmp")]
+    assert len([name for name in names if name.endswith(".npy")]) == 4
+    assert len([name for name in names if name.endswith(".items.json")]) == 4
+
+    # Reusing the first run's file makes it the most recently used
+    first = WisRuleWithNegative(runs[0], 0.1, 0.3, 0.1, counting_engine="mmap").incidence_path
+    for age, path in enumerate(sorted(tmp_path.glob("wisrule_*.npy"))):
+        if str(path) != first:
+            os.utime(path, (age, age))
+    prune_incidence_files(str(tmp_path), keep=2)
+    kept = sorted(tmp_path.glob("wisrule_*.npy"))
+    assert len(kept) == 2 and first in map(str, kept)
+    assert len(list(tmp_path.glob("wisrule_*.items.json"))) == 2
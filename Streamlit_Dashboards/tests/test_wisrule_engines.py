@@ -0,0 +1,83 @@
+import random
+import tempfile
+
+import pytest
+
+from utils.wisrule import WisRuleWithNegative
+from utils.wisrule_benchmark import generate_yoy_transactions
+
+# Every counting engine and mining algorithm pairing the miner accepts
+CONFIGURATIONS = [
+    ("horizontal", "apriori"),
+    ("horizontal", "fpgrowth"),
+    ("bitset", "apriori"),
+    ("bitset", "fpgrowth"),
+    ("mmap", "apriori"),
+]
+
+
+@pytest.fixture(autouse=True)
+def incidence_dir(tmp_path, monkeypatch):
+    # Default incidence files are shared through the temp dir, keep each test's apart
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+
+
+def small_transactions():
+    rng = random.Random(0)
+    return [rng.sample("abcdef", rng.randint(1, 3)) for _ in range(30)]
+
+
+def mine(transactions, min_support, **options):
+    miner = WisRuleWithNegative(transactions, min_support, 0.3, 0.1, **options)
+    miner.generate_frequent_itemsets()
+    miner.generate_rules()
+    return miner
+
+
+def item_support(miner):
+    decode = miner.item_dictionary.decode
+    return {decode(itemset): support for itemset, support in miner.item_support.items()}
+
+
+def rule_metrics(miner):
+    return {(antecedent, negation, consequent): tuple(metrics)
+            for antecedent, negation, consequent, *metrics in miner.get_rules()}
+
+
+def assert_same_run(actual, expected):
+    assert item_support(actual) == pytest.approx(item_support(expected))
+    actual_rules, expected_rules = rule_metrics(actual), rule_metrics(expected)
+    assert actual_rules.keys() == expected_rules.keys()
+    for key, metrics in expected_rules.items():
+        assert actual_rules[key][1] == metrics[1]
+        assert [actual_rules[key][idx] for idx in (0, 2, 3, 4, 5)] == \
+            pytest.approx([metrics[idx] for idx in (0, 2, 3, 4, 5)])
+
+
+@pytest.mark.parametrize("counting_engine, mining_algorithm", CONFIGURATIONS[1:])
+@pytest.mark.parametrize("transactions, min_support", [
+    (generate_yoy_transactions(1500, seed=2), 0.1),
+    # Candidates with a count of zero must not count as frequent at a support of 0
+    (small_transactions(), 0.0),
+], ids=["yoy", "zero_support"])
+def test_engines_and_algorithms_mine_the_same_rules(transactions, min_support, counting_engine, mining_algorithm):
+    expected = mine(transactions, min_support)
+    actual = mine(transactions, min_support, counting_engine=counting_engine, mining_algorithm=mining_algorithm)
+    assert_same_run(actual, expected)
+
+
+def test_parallel_rule_generation_matches_serial_order():
+    transactions = generate_yoy_transactions(1500, seed=3)
+    serial = mine(transactions, 0.1)
+    parallel = mine(transactions, 0.1, rule_workers=2)
+    assert [rule[:3] for rule in parallel.get_rules()] == [rule[:3] for rule in serial.get_rules()]
+    assert_same_run(parallel, serial)
+
+
+@pytest.mark.parametrize("counting_engine", ["horizontal", "bitset", "mmap"])
+def test_update_matches_mining_everything_at_once(counting_engine):
+    transactions = generate_yoy_transactions(2000, seed=4)
+    updated = mine(transactions[:1500], 0.1, counting_engine=counting_engine)
+    updated.update(transactions[1500:])
+    updated.generate_rules()
+    assert_same_run(updated, mine(transactions, 0.1, counting_engine=counting_engine))
@@ -0,0 +1,97 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils import sqlite_backend
+from utils.wisrule_transactions import (MINING_COLUMNS, create_dimension_transactions,
+                                        create_dimension_transactions_vectorized, create_yoy_transactions,
+                                        create_yoy_transactions_vectorized, prepare_mining_frame)
+
+SQL_DUMP = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Database", "iesa_db_v2.sql")
+
+# The page's utility table, and location tables with a year or a province to label rows by
+UTILITY_TABLE = "electricity_consumption_by_sector_gwh"
+LOCATION_TABLES = ["annual_electricity_data", "province_wise_energy_consumption"]
+
+
+@pytest.fixture(scope="module")
+def bundled_tables():
+    conn = sqlite_backend.connect(":memory:")
+    try:
+        sqlite_backend.load_dump(conn, SQL_DUMP)
+        tables = {}
+        for (table_name,) in conn.execute("SHOW TABLES").fetchall():
+            cursor = conn.execute(f"SELECT * FROM `{table_name}`")
+            tables[table_name] = pd.DataFrame(cursor.fetchall(), columns=[desc[0] for desc in cursor.description])
+    finally:
+        conn.close()
+    return tables
+
+
+def random_yoy_frame(rng, rows):
+    # Few distinct values so years rise, fall and stay flat, with gaps and a repeated year
+    data = {
+        "Year": rng.choice(np.arange(2000, 2000 + rows + 2), size=rows),
+        "Generation (GWh)": rng.integers(-2, 3, size=rows).astype(float),
+        "Imports (GWh)": rng.choice([0.0, 1.5, np.nan, 3.0], size=rows),
+        "Consumption (GWh)": rng.integers(0, 4, size=rows),
+    }
+    return pd.DataFrame(data)
+
+
+def random_dimension_frames(rng, rows):
+    location_df = pd.DataFrame({
+        "Province": rng.choice(np.array(["Punjab", "Sindh", "", None], dtype=object), size=rows),
+        "Region": rng.choice(np.array(["North", "South", None], dtype=object), size=rows),
+        "Year": rng.choice([0, 2019, 2020], size=rows),
+    })
+    utility_df = pd.DataFrame({
+        "Sector": rng.choice(["Domestic", "Industrial"], size=rows + 2),
+        "Domestic": rng.choice([1.0, np.nan], size=rows + 2),
+        "Industrial": rng.choice([2.0, np.nan], size=rows + 2),
+    })
+    return location_df, utility_df
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_yoy_transactions_match_row_loop_on_random_frames(seed):
+    rng = np.random.default_rng(seed)
+    df = random_yoy_frame(rng, int(rng.integers(1, 30)))
+    # Columns the frame lacks are skipped by both
+    columns = list(MINING_COLUMNS)
+    assert create_yoy_transactions_vectorized(df, columns) == create_yoy_transactions(df, columns)
+
+
+def test_yoy_transactions_match_row_loop_without_a_year_column():
+    df = random_yoy_frame(np.random.default_rng(0), 12).drop(columns="Year")
+    columns = list(df.columns)
+    assert create_yoy_transactions_vectorized(df, columns) == create_yoy_transactions(df, columns)
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_dimension_transactions_match_row_loop_on_random_frames(seed):
+    rng = np.random.default_rng(seed)
+    location_df, utility_df = random_dimension_frames(rng, int(rng.integers(1, 30)))
+    assert create_dimension_transactions_vectorized(location_df, utility_df) == \
+        create_dimension_transactions(location_df, utility_df)
+
+
+def test_yoy_transactions_match_row_loop_on_bundled_tables(bundled_tables):
+    for table_name, data in bundled_tables.items():
+        df = prepare_mining_frame(data.copy())
+        # As the page does, the numeric columns stand in when a table lacks the mining columns
+        columns = list(MINING_COLUMNS)
+        if any(col not in df.columns for col in columns):
+            columns = list(df.select_dtypes(include=["number"]).columns[:4])
+        assert create_yoy_transactions_vectorized(df, columns) == create_yoy_transactions(df, columns), table_name
+
+
+@pytest.mark.parametrize("location_table", LOCATION_TABLES)
+def test_dimension_transactions_match_row_loop_on_bundled_tables(bundled_tables, location_table):
+    # The page passes these tables unprepared, and the row loop needs a utility row per location row
+    utility_df = bundled_tables[UTILITY_TABLE]
+    location_df = bundled_tables[location_table].iloc[:len(utility_df)]
+    assert create_dimension_transactions_vectorized(location_df, utility_df) == \
+        create_dimension_transactions(location_df, utility_df)
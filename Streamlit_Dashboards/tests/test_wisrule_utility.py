@@ -0,0 +1,106 @@
+import math
+import random
+
+import pytest
+
+from utils.wisrule import WisRuleWithNegative
+from utils.wisrule_benchmark import generate_yoy_transactions
+from utils.wisrule_utility import create_utility_dict_vectorized, evaluate_full_rules
+
+METRICS = ("support", "confidence", "utility", "interestingness", "wisval")
+
+
+# Row-by-row formulas of the enhanced WisRule prototype the engine vectorizes
+def create_utility_dict(itemsets, transactions):
+    return {
+        itemset: sum(len(itemset) for tx in transactions if itemset.issubset(set(tx))) / len(transactions)
+        for itemset in itemsets
+    }
+
+
+def evaluate_full_rule(antecedent, consequent, support_dict, utility_dict, context_value=None,
+                       normal_range=(0, 100), weights=(0.25, 0.25, 0.25, 0.25)):
+    supp_a = support_dict.get(antecedent, 0)
+    supp_b = support_dict.get(consequent, 0)
+    supp_ab = support_dict.get(antecedent.union(consequent), 0)
+    u_a = utility_dict.get(antecedent, 1)
+    u_b = utility_dict.get(consequent, 1)
+    u_ab = utility_dict.get(antecedent.union(consequent), 1)
+    denominator = u_a * supp_a * (1 - supp_b)
+    utility = 0 if denominator == 0 else ((u_ab * supp_ab) - (u_a * supp_a * u_b * supp_a)) / denominator
+    interestingness = 0 if supp_a * supp_b == 0 else supp_ab / (supp_a * supp_b)
+    support = supp_ab
+    if context_value is not None:
+        outside = context_value < normal_range[0] or context_value > normal_range[1]
+        support = supp_ab - 0.05 if outside else supp_ab + 0.05
+    alpha, beta, gamma, delta = weights
+    return {
+        "support": support,
+        "confidence": supp_a,
+        "utility": utility,
+        "interestingness": interestingness,
+        "wisval": (alpha * support) + (beta * supp_a) + (gamma * utility) + (delta * interestingness),
+    }
+
+
+def assert_metrics_close(actual, expected):
+    for metric in METRICS:
+        assert math.isclose(actual[metric], expected[metric], rel_tol=1e-9, abs_tol=1e-12), metric
+
+
+@pytest.fixture
+def transactions():
+    rng = random.Random(3)
+    items = [f"item{idx}" for idx in range(8)]
+    return [rng.sample(items, rng.randint(1, 5)) for _ in range(300)]
+
+
+def test_utility_dict_matches_row_loop(transactions):
+    # Includes itemsets no transaction holds and items never seen
+    itemsets = [frozenset(["item0"]), frozenset(["item1", "item2"]), frozenset(["item3", "item4", "item5"]),
+                frozenset(["item0", "unknown"]), frozenset(["item6", "item7"])]
+    vectorized = create_utility_dict_vectorized(itemsets, transactions)
+    expected = create_utility_dict(itemsets, transactions)
+    assert vectorized.keys() == expected.keys()
+    for itemset in itemsets:
+        assert math.isclose(vectorized[itemset], expected[itemset])
+
+
+def test_full_rules_match_row_loop_with_and_without_context(transactions):
+    rng = random.Random(5)
+    itemsets = {frozenset(rng.sample([f"item{idx}" for idx in range(8)], rng.randint(1, 3))) for _ in range(40)}
+    support_dict = {itemset: sum(itemset.issubset(tx) for tx in transactions) / len(transactions)
+                    for itemset in itemsets}
+    utility_dict = create_utility_dict(itemsets, transactions)
+    rules = [(antecedent, consequent) for antecedent in itemsets for consequent in itemsets
+             if not antecedent & consequent][:200]
+    # Missing, inside and outside the normal range
+    context_values = [rng.choice([None, 50, -10, 120]) for _ in rules]
+
+    for values in (None, context_values):
+        scored = evaluate_full_rules(rules, support_dict, utility_dict, values)
+        for idx, ((antecedent, consequent), metrics) in enumerate(zip(rules, scored)):
+            context_value = None if values is None else values[idx]
+            assert_metrics_close(metrics, evaluate_full_rule(antecedent, consequent, support_dict, utility_dict,
+                                                             context_value))
+
+
+def test_negative_rules_are_scored_on_the_complement_of_their_consequent():
+    transactions = generate_yoy_transactions(1000, seed=11)
+    miner = WisRuleWithNegative(transactions, 0.1, 0.3, 0.1)
+    miner.generate_frequent_itemsets()
+    miner.generate_rules()
+    sets = [set(transaction) for transaction in transactions]
+
+    negatives = 0
+    for rule, metrics in zip(miner.get_rules(), miner.full_rule_metrics()):
+        antecedent, negation, consequent = rule[:3]
+        if negation != "¬":
+            continue
+        negatives += 1
+        holds = sum(antecedent <= tx and not consequent <= tx for tx in sets) / len(sets)
+        consequent_support = 1 - sum(consequent <= tx for tx in sets) / len(sets)
+        assert math.isclose(metrics["support"], holds, abs_tol=1e-12)
+        if metrics["confidence"] * consequent_support:
+            assert math.isclose(metrics["interestingness"], holds / (metrics["confidence"] * consequent_support))
+    assert negatives
@@ -0,0 +1,110 @@
+import os
+import threading
+
+try:
+    import mysql.connector
+    from mysql.connector import errors, pooling
+except ImportError:
+    # Only the embedded backend can run without the MySQL driver
+    mysql = None
+
+from utils import sqlite_backend
+from utils.logger import setup_logger
+
+logger = setup_logger("iesa_db")
+
+# "mysql", or "sqlite" for the embedded database loaded from a Database/*.sql dump
+BACKEND = os.environ.get("IESA_DB_BACKEND", "mysql").lower()
+
+# Connection settings, overridable through the environment
+DB_CONFIG = {
+    "host": os.environ.get("IESA_DB_HOST", "localhost"),
+    "port": os.environ.get("IESA_DB_PORT", "3306"),
+    "user": os.environ.get("IESA_DB_USER", "root"),
+    "passwd": os.environ.get("IESA_DB_PASSWORD", "admin123"),
+    "db": os.environ.get("IESA_DB_NAME", "iesa_db"),
+}
+
+# Connections kept open and shared by every session of this Streamlit process (mysql.connector allows 1-32)
+POOL_SIZE = int(os.environ.get("IESA_DB_POOL_SIZE", "8"))
+
+# Tables the app keeps for itself in the database, never offered to users as data
+INTERNAL_TABLES = frozenset({"iesa_table_versions", "wisrule_runs", "wisrule_results"})
+
+# Tables holding user credentials, never copied out of the database
+PRIVATE_TABLES = frozenset({"user_data"})
+
+_pool = None
+_pool_lock = threading.Lock()
+
+_created_tables = set()
+_created_lock = threading.Lock()
+
+
+def get_pool():
+    """Process-wide connection pool, created on first use"""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = pooling.MySQLConnectionPool(pool_name="iesa_pool", pool_size=POOL_SIZE,
+                                                    pool_reset_session=True, **DB_CONFIG)
+    return _pool
+
+
+def get_connection():
+    """Pooled connection, health-checked before use; close() hands it back to the pool"""
+    if BACKEND == "sqlite":
+        return sqlite_backend.get_connection()
+    if mysql is None:
+        raise ImportError("mysql-connector-python is required unless IESA_DB_BACKEND=sqlite")
+    try:
+        conn = get_pool().get_connection()
+    except errors.PoolError:
+        # Every pooled connection is busy, serve this call with a dedicated one rather than fail
+        logger.warning("Connection pool exhausted, opening an unpooled connection")
+        return mysql.connector.connect(**DB_CONFIG)
+    # A connection idle past the server's wait_timeout is silently dropped, reconnect it here
+    try:
+        conn.ping(reconnect=True, attempts=2, delay=0)
+    except errors.Error:
+        # Hand the slot back to the pool even though the server is unreachable, the next ping reconnects it
+        try:
+            conn.close()
+        except errors.Error:
+            pass
+        raise
+    return conn
+
+
+def database_identity():
+    """Which database get_connection reaches, so data read from one is never served for another"""
+    if BACKEND == "sqlite":
+        return f"sqlite:{sqlite_backend.SQLITE_PATH}:{os.path.abspath(sqlite_backend.SQL_DUMP)}"
+    return f"mysql:{DB_CONFIG['host']}:{DB_CONFIG['port']}/{DB_CONFIG['db']}"
+
+
+def ensure_tables(conn, *statements):
+    """Run CREATE TABLE IF NOT EXISTS statements on conn, each only once per process"""
+    with _created_lock:
+        missing = [statement for statement in statements if statement not in _created_tables]
+        if not missing:
+            return
+        cursor = conn.cursor()
+        for statement in missing:
+            cursor.execute(statement)
+        cursor.close()
+        _created_tables.update(missing)
+
+
+def list_tables(exclude=()):
+    """Data tables of the database, without the app's internal ones or those in exclude"""
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute("SHOW TABLES")
+        tables = [row[0] for row in cursor.fetchall() if row[0] not in INTERNAL_TABLES and row[0] not in exclude]
+        cursor.close()
+    finally:
+        conn.close()
+    return tables
@@ -0,0 +1,137 @@
+"""Embedded SQLite stand-in for the MySQL database
+
+Selected with IESA_DB_BACKEND=sqlite. The database is loaded from a Database/*.sql mysqldump
+on first use, kept in memory by default or in the IESA_SQLITE_PATH file, and its
+connections accept the MySQL dialect the pages use: %s placeholders, backticked names
+and SHOW TABLES. Prebuild a database file for benchmarks from the Streamlit_Dashboards
+folder with:
+
+    python -m utils.sqlite_backend --output iesa_db.sqlite
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import threading
+
+# Dump loaded into an empty database, the latest one since only it has scenario_definitions
+SQL_DUMP = os.environ.get(
+    "IESA_SQL_DUMP",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..", "Database", "iesa_db_v2.sql")
+)
+
+# A file path, or a shared in-memory database living as long as the process
+SQLITE_PATH = os.environ.get("IESA_SQLITE_PATH", "file:iesa_db?mode=memory&cache=shared")
+
+SHOW_TABLES = "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%' ORDER BY name"
+
+# MySQL string escapes in dumped values and their SQLite literal equivalents
+MYSQL_ESCAPES = {"'": "''", '"': '"', "\\": "\\", "n": "\n", "r": "\r", "t": "\t", "0": "\0"}
+
+# String literals and quoted names, whose contents are never placeholders
+QUOTED = re.compile(r"""('(?:[^'\\]|\\.|'')*'|"(?:[^"\\]|\\.|"")*"|`(?:[^`]|``)*`)""")
+
+_keeper = None
+_load_lock = threading.Lock()
+
+
+def translate(query):
+    """A MySQL-dialect query as SQLite runs it"""
+    if query.strip().rstrip(";").upper() == "SHOW TABLES":
+        return SHOW_TABLES
+    # re.split keeps the quoted parts at odd positions
+    parts = QUOTED.split(query)
+    return "".join(part if idx % 2 else part.replace("%s", "?") for idx, part in enumerate(parts))
+
+
+class SQLiteCursor(sqlite3.Cursor):
+    def execute(self, query, parameters=()):
+        return super().execute(translate(query), parameters)
+
+    def executemany(self, query, seq_of_parameters):
+        return super().executemany(translate(query), seq_of_parameters)
+
+
+class SQLiteConnection(sqlite3.Connection):
+    """sqlite3 connection whose cursors speak the pages' MySQL dialect, pandas.read_sql included"""
+
+    def cursor(self, factory=SQLiteCursor):
+        return super().cursor(factory)
+
+    def execute(self, query, parameters=()):
+        return self.cursor().execute(query, parameters)
+
+
+def mysql_dump_to_sqlite(dump):
+    """SQLite script of a mysqldump file: its tables, keys and rows without MySQL-only clauses"""
+    lines = []
+    for line in dump.splitlines():
+        stripped = line.strip()
+        if not stripped or stripped.startswith(("--", "/*!", "LOCK TABLES", "UNLOCK TABLES", "CREATE DATABASE", "USE ")):
+            continue
+        if stripped.startswith(("KEY ", "FULLTEXT KEY ", "CONSTRAINT ")):
+            # Plain indexes and foreign keys are left out, the trailing comma is fixed below
+            continue
+        if stripped.startswith("INSERT INTO"):
+            line = re.sub(r"\\(.)", lambda match: MYSQL_ESCAPES.get(match.group(1), match.group(1)), line)
+        else:
+            line = re.sub(r"UNIQUE KEY `[^`]*` \(", "UNIQUE (", line)
+            line = re.sub(r" (AUTO_INCREMENT|CHARACTER SET \w+|COLLATE \w+)(?=[ ,])", "", line)
+            line = re.sub(r"^\) ENGINE=.*;$", ");", line)
+        lines.append(line)
+    return re.sub(r",\n\);", "\n);", "\n".join(lines))
+
+
+def load_dump(conn, path=SQL_DUMP):
+    with open(path, encoding="utf-8") as dump:
+        conn.executescript(mysql_dump_to_sqlite(dump.read()))
+    conn.commit()
+
+
+def connect(path=SQLITE_PATH):
+    return sqlite3.connect(path, uri=path.startswith("file:"), factory=SQLiteConnection, check_same_thread=False)
+
+
+def get_connection():
+    """Connection to the embedded database, loading the dump into it the first time it is empty"""
+    global _keeper
+    if _keeper is None:
+        with _load_lock:
+            if _keeper is None:
+                # Held open for the life of the process, an in-memory database is dropped with its last connection
+                keeper = connect()
+                if not keeper.execute(SHOW_TABLES).fetchall():
+                    load_dump(keeper)
+                _keeper = keeper
+    return connect()
+
+
+def data_stamp():
+    """When the embedded database's data last changed on disk: its file, or the dump an in-memory one is loaded from"""
+    path = SQL_DUMP if "mode=memory" in SQLITE_PATH else SQLITE_PATH
+    try:
+        return str(os.stat(path).st_mtime_ns)
+    except OSError:
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build a SQLite database from a mysqldump of iesa_db")
+    parser.add_argument("dump", nargs="?", default=SQL_DUMP)
+    parser.add_argument("--output", default="iesa_db.sqlite")
+    args = parser.parse_args(argv)
+    if os.path.exists(args.output):
+        os.remove(args.output)
+    conn = connect(args.output)
+    try:
+        load_dump(conn, args.dump)
+        tables = [row[0] for row in conn.execute(SHOW_TABLES)]
+    finally:
+        conn.close()
+    print(f"{args.output}: {len(tables)} tables from {args.dump}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
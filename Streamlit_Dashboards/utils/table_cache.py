@@ -0,0 +1,307 @@
+"""Process-wide cache of whole tables, invalidated through per-table version counters
+
+Anything that writes a table calls bump_table_version so every dashboard re-reads it.
+Loads done outside the app, e.g. re-importing a Database/*.sql dump, are picked up from
+the database's own record of when each table last changed, and can still be forced
+from the Streamlit_Dashboards folder:
+
+    python -m utils.table_cache annual_electricity_data
+"""
+import argparse
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils import sqlite_backend
+from utils.db import BACKEND, ensure_tables, get_connection
+from utils.logger import setup_logger
+from utils.table_snapshots import read_snapshot, write_snapshot
+
+logger = setup_logger("iesa_table_cache")
+
+# Seconds a process trusts its copy of the table versions before reading them again
+VERSION_TTL = float(os.environ.get("IESA_TABLE_VERSION_TTL", "2"))
+
+# Cached table copies and their total in-memory size before least recently used ones are evicted
+MAX_CACHED_TABLES = int(os.environ.get("IESA_TABLE_CACHE_ENTRIES", "64"))
+MAX_CACHED_BYTES = int(os.environ.get("IESA_TABLE_CACHE_MB", "256")) * 2 ** 20
+
+# Aggregate values kept, each only a number
+MAX_CACHED_AGGREGATES = 4096
+
+# SQL of each data planner metric type over a column
+AGGREGATE_FUNCTIONS = {
+    "Sum": "SUM({})",
+    "Count": "COUNT({})",
+    "Average": "AVG({})",
+    "Unique": "COUNT(DISTINCT {})",
+}
+
+TABLE_VERSIONS_DDL = """
+CREATE TABLE IF NOT EXISTS `iesa_table_versions` (
+  `table_name` varchar(64) NOT NULL,
+  `version` bigint unsigned NOT NULL DEFAULT 0,
+  PRIMARY KEY (`table_name`)
+)
+"""
+
+
+def quote_name(name):
+    return "`" + str(name).replace("`", "``") + "`"
+
+
+class TableVersions:
+    """Per-table versions every process sees, read at most every VERSION_TTL
+
+    A version pairs the counter write paths bump in MySQL with when the database itself last
+    changed the table, so loads done outside the app invalidate cached copies without a bump.
+    """
+
+    def __init__(self, ttl=VERSION_TTL):
+        self.ttl = ttl
+        self.versions = {}
+        self.stamps = {}
+        self.checksums = {}
+        self.read_at = None
+        self.lock = threading.Lock()
+
+    def refresh(self):
+        conn = get_connection()
+        try:
+            ensure_tables(conn, TABLE_VERSIONS_DDL)
+            cursor = conn.cursor()
+            cursor.execute("SELECT `table_name`, `version` FROM `iesa_table_versions`")
+            self.versions = {table_name: version for table_name, version in cursor.fetchall()}
+            self.stamps = self.load_stamps(cursor)
+            cursor.close()
+        finally:
+            conn.close()
+        self.read_at = time.monotonic()
+
+    def load_stamps(self, cursor):
+        """When the database last changed each table, None for tables it does not say"""
+        if BACKEND == "sqlite":
+            stamp = sqlite_backend.data_stamp()
+            cursor.execute("SHOW TABLES")
+            return {table_name: stamp for (table_name,) in cursor.fetchall()}
+        try:
+            # MySQL 8 answers UPDATE_TIME from statistics cached for a day by default, read them fresh
+            cursor.execute("SET SESSION information_schema_stats_expiry = 0")
+        except Exception:
+            # Older servers always read them fresh and have no such variable
+            pass
+        cursor.execute("SELECT `TABLE_NAME`, `UPDATE_TIME` FROM information_schema.TABLES WHERE `TABLE_SCHEMA` = DATABASE()")
+        stamps = {}
+        for table_name, update_time in cursor.fetchall():
+            if update_time is not None:
+                stamps[table_name] = update_time.isoformat()
+                self.checksums.pop(table_name, None)
+                continue
+            # InnoDB forgets UPDATE_TIME on restart until the next write, the rows cannot change before it
+            # so they are checksummed once per process, and only for tables that are read (see get)
+            stamps[table_name] = self.checksums.get(table_name)
+        return stamps
+
+    def checksum(self, table_name):
+        conn = get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(f"CHECKSUM TABLE {quote_name(table_name)}")
+            checksum = cursor.fetchone()[1]
+            cursor.close()
+        finally:
+            conn.close()
+        return f"checksum-{checksum}"
+
+    def get(self, table_name):
+        """Current version of a table, "0" until a write path first bumps it or the database reports a change"""
+        with self.lock:
+            if self.read_at is None or time.monotonic() - self.read_at > self.ttl:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    # Keep serving the last known versions rather than fail the page
+                    logger.warning(f"Could not read table versions: {e}")
+                    self.read_at = time.monotonic()
+            version = str(self.versions.get(table_name, 0))
+            stamp = self.stamps.get(table_name)
+            unstamped = stamp is None and BACKEND != "sqlite" and table_name in self.stamps
+        if unstamped:
+            # A full scan of the table, run outside the lock every other table's readers wait on
+            try:
+                stamp = self.checksum(table_name)
+            except Exception as e:
+                logger.warning(f"Could not checksum {table_name}: {e}")
+            else:
+                with self.lock:
+                    self.checksums[table_name] = stamp
+                    # Left alone if a refresh meanwhile found UPDATE_TIME set, which then stands for the table
+                    if table_name in self.stamps and self.stamps[table_name] is None:
+                        self.stamps[table_name] = stamp
+        return version if stamp is None else f"{version}-{stamp}"
+
+    def bump(self, table_name, conn=None):
+        """Invalidate every cached copy of a table, call after writing to it (inside its transaction if conn is given)"""
+        own_connection = conn is None
+        if own_connection:
+            conn = get_connection()
+        try:
+            ensure_tables(conn, TABLE_VERSIONS_DDL)
+            cursor = conn.cursor()
+            # Update-then-insert rather than an upsert, which MySQL and SQLite spell differently
+            cursor.execute(
+                "UPDATE `iesa_table_versions` SET `version` = `version` + 1 WHERE `table_name` = %s", (table_name,)
+            )
+            if cursor.rowcount == 0:
+                cursor.execute(
+                    "INSERT INTO `iesa_table_versions` (`table_name`, `version`) VALUES (%s, 1)", (table_name,)
+                )
+            cursor.close()
+            if own_connection:
+                conn.commit()
+        finally:
+            if own_connection:
+                conn.close()
+        # This process sees its own write at once, others within VERSION_TTL
+        with self.lock:
+            self.read_at = None
+
+
+class TableCache:
+    """Process-wide LRU of table DataFrames keyed by (table name, version), bounded by count and bytes"""
+
+    def __init__(self, versions, max_entries=MAX_CACHED_TABLES, max_bytes=MAX_CACHED_BYTES):
+        self.versions = versions
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.sizes = {}
+        self.lock = threading.Lock()
+
+    def get(self, table_name, loader):
+        """Copy of the table at its current version, loaded with loader(table_name, version) on a miss"""
+        key = (table_name, self.versions.get(table_name))
+        with self.lock:
+            data = self.entries.get(key)
+            if data is not None:
+                self.entries.move_to_end(key)
+                # Pages convert columns in place, so each caller gets its own copy
+                return data.copy()
+
+        data = loader(*key)
+        with self.lock:
+            # Older versions of the table can never be served again
+            for stale in [cached for cached in self.entries if cached[0] == table_name and cached != key]:
+                self.evict(stale)
+            self.entries[key] = data
+            self.sizes[key] = int(data.memory_usage(deep=True).sum())
+            while len(self.entries) > self.max_entries or \
+                    (len(self.entries) > 1 and sum(self.sizes.values()) > self.max_bytes):
+                self.evict(next(iter(self.entries)))
+        return data.copy()
+
+    def evict(self, key):
+        del self.entries[key]
+        del self.sizes[key]
+
+
+def load_table(table_name):
+    """Whole table as a DataFrame, straight from MySQL"""
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT * FROM `{table_name}`")
+        rows = cursor.fetchall()
+        data = pd.DataFrame(rows, columns=[desc[0] for desc in cursor.description])
+        cursor.close()
+    finally:
+        conn.close()
+    return data
+
+
+def load_table_version(table_name, version):
+    """Table at a version from its local snapshot, or from MySQL refreshing the snapshot"""
+    data = read_snapshot(table_name, version)
+    if data is None:
+        data = load_table(table_name)
+        write_snapshot(table_name, version, data)
+    return data
+
+
+def load_aggregates(table_name, metrics):
+    """Values of (column, metric type) pairs of a table, from a single SELECT over just those columns"""
+    expressions = [AGGREGATE_FUNCTIONS[metric_type].format(quote_name(column)) for column, metric_type in metrics]
+    conn = get_connection()
+    try:
+        cursor = conn.cursor()
+        cursor.execute(f"SELECT {', '.join(expressions)} FROM {quote_name(table_name)}")
+        row = cursor.fetchone()
+        cursor.close()
+    finally:
+        conn.close()
+    # SUM and AVG of an empty or all-NULL column are NULL, where pandas gives 0 and NaN
+    return {metric: 0 if value is None else value for metric, value in zip(metrics, row)}
+
+
+table_versions = TableVersions()
+table_cache = TableCache(table_versions)
+
+_aggregates = OrderedDict()
+_aggregates_lock = threading.Lock()
+
+
+def read_table(table_name):
+    """Whole table through the shared cache and snapshots, re-read from MySQL only after its version is bumped"""
+    return table_cache.get(table_name, load_table_version)
+
+
+def aggregate_table(table_name, metrics):
+    """Values of (column, metric type) pairs of a table, keyed by pair and cached per table version
+
+    Only the pairs missing from the cache are queried, all in one SELECT, so the rows
+    never leave the database however large the table grows.
+    """
+    metrics = list(dict.fromkeys(metrics))
+    for _, metric_type in metrics:
+        if metric_type not in AGGREGATE_FUNCTIONS:
+            raise ValueError(f"Unknown metric type '{metric_type}', expected one of {tuple(AGGREGATE_FUNCTIONS)}")
+    version = table_versions.get(table_name)
+    values = {}
+    with _aggregates_lock:
+        for metric in metrics:
+            key = (table_name, version, metric)
+            if key in _aggregates:
+                _aggregates.move_to_end(key)
+                values[metric] = _aggregates[key]
+    missing = [metric for metric in metrics if metric not in values]
+    if missing:
+        loaded = load_aggregates(table_name, missing)
+        values.update(loaded)
+        with _aggregates_lock:
+            for metric, value in loaded.items():
+                _aggregates[(table_name, version, metric)] = value
+            while len(_aggregates) > MAX_CACHED_AGGREGATES:
+                _aggregates.popitem(last=False)
+    return values
+
+
+def bump_table_version(table_name, conn=None):
+    table_versions.bump(table_name, conn)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Invalidate cached copies of tables after loading them outside the app")
+    parser.add_argument("tables", nargs="+")
+    args = parser.parse_args(argv)
+    for table_name in args.tables:
+        bump_table_version(table_name)
+        print(f"{table_name}: version {table_versions.get(table_name)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
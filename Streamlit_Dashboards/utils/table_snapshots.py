@@ -0,0 +1,117 @@
+"""Local Arrow snapshots of the database tables for the read-only dashboards
+
+Each table is written to <SNAPSHOT_DIR>/<database>/<table>.arrow, one folder per database
+the app is pointed at, tagged with the table version it was read at. read_table serves a
+snapshot by memory-mapping it while that version is current, and rewrites it from MySQL
+once a write bumps the version or the database reports the table changed. Export every
+table but the credential ones ahead of time from the Streamlit_Dashboards folder with:
+
+    python -m utils.table_snapshots [table ...]
+
+Snapshots need pyarrow, without it every read goes to MySQL as before.
+"""
+import argparse
+import hashlib
+import os
+import sys
+import tempfile
+
+try:
+    import pyarrow as pa
+except ImportError:
+    pa = None
+
+from utils.db import PRIVATE_TABLES, database_identity, list_tables
+from utils.logger import setup_logger
+
+logger = setup_logger("iesa_table_snapshots")
+
+SNAPSHOT_DIR = os.environ.get("IESA_SNAPSHOT_DIR", "snapshots")
+
+# Schema metadata key holding the table version a snapshot was read at
+VERSION_KEY = b"iesa_table_version"
+
+
+def snapshot_dir():
+    """Folder of the current database's snapshots, so a switched backend or database never reads another's"""
+    return os.path.join(SNAPSHOT_DIR, hashlib.sha256(database_identity().encode()).hexdigest()[:16])
+
+
+def snapshot_path(table_name):
+    return os.path.join(snapshot_dir(), f"{table_name}.arrow")
+
+
+def read_snapshot(table_name, version):
+    """The table from its snapshot when one exists at this version, else None"""
+    path = snapshot_path(table_name)
+    if pa is None or table_name in PRIVATE_TABLES or not os.path.exists(path):
+        return None
+    try:
+        # Arrow IPC files map straight into memory, numeric columns are not copied on read
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            metadata = reader.schema.metadata or {}
+            if metadata.get(VERSION_KEY) != str(version).encode():
+                return None
+            return reader.read_all().to_pandas()
+    except (OSError, pa.ArrowException) as e:
+        logger.warning(f"Ignoring unreadable snapshot {path}: {e}")
+        return None
+
+
+def write_snapshot(table_name, version, data):
+    """Write the table's snapshot at this version, replacing any older one; False when it cannot"""
+    if pa is None or table_name in PRIVATE_TABLES:
+        return False
+    try:
+        table = pa.Table.from_pandas(data, preserve_index=False)
+        table = table.replace_schema_metadata({**(table.schema.metadata or {}), VERSION_KEY: str(version).encode()})
+        directory = snapshot_dir()
+        os.makedirs(directory, exist_ok=True)
+        # Written beside the old snapshot and swapped in, so readers never map a partial file
+        handle, temp_path = tempfile.mkstemp(dir=directory, suffix=".arrow.tmp")
+        os.close(handle)
+        try:
+            with pa.OSFile(temp_path, "wb") as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            os.replace(temp_path, snapshot_path(table_name))
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
+    except (OSError, pa.ArrowException) as e:
+        logger.warning(f"Could not snapshot {table_name}: {e}")
+        return False
+    return True
+
+
+def export_snapshots(table_names=None):
+    """Snapshot the given tables, or every data table of the database, at their current versions
+
+    Credential tables are never written, even when named.
+    """
+    # Imported here since table_cache reads through this module
+    from utils.table_cache import load_table, table_versions
+    exported = []
+    for table_name in table_names or list_tables(exclude=PRIVATE_TABLES):
+        if table_name in PRIVATE_TABLES:
+            logger.warning(f"Not snapshotting {table_name}, it holds credentials")
+            continue
+        if write_snapshot(table_name, table_versions.get(table_name), load_table(table_name)):
+            exported.append(table_name)
+    return exported
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Write Arrow snapshots of database tables for the dashboards")
+    parser.add_argument("tables", nargs="*", help="Tables to snapshot, every data table when omitted")
+    args = parser.parse_args(argv)
+    if pa is None:
+        print("pyarrow is not installed, no snapshots written")
+        return 1
+    for table_name in export_snapshots(args.tables):
+        print(f"{table_name}: {snapshot_path(table_name)}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
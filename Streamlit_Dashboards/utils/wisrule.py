@@ -0,0 +1,1186 @@
+import copy
+import glob
+import hashlib
+import heapq
+import json
+import math
+import os
+import random
+import tempfile
+import threading
+import time
+import numpy as np
+from array import array
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import combinations, islice
+
+from utils.wisrule_utility import evaluate_full_rules, utility_dict_from_supports
+
+# Supported support-counting backends for WisRuleWithNegative, mmap streams an on-disk incidence matrix
+COUNTING_ENGINES = ("horizontal", "bitset", "mmap")
+
+# Supported frequent itemset generators for WisRuleWithNegative
+MINING_ALGORITHMS = ("apriori", "fpgrowth")
+
+# Which frequent itemsets rules are derived from: all of them, closed ones or maximal ones
+ITEMSET_MODES = ("all", "closed", "maximal")
+
+# WisVal weights of confidence, lift and UPII used by calculate_wisval
+WISVAL_WEIGHTS = (0.4, 0.3, 0.3)
+
+# Slack added to WisVal upper bounds so float rounding never prunes a reachable rule
+_BOUND_SLACK = 1e-9
+
+# Rough bytes one counted candidate costs across the count dictionaries, for memory budgets
+_CANDIDATE_BYTES = 512
+
+# Candidates counted between deadline checks when a time budget is set
+_DEADLINE_CHUNK = 1024
+
+# Number of set bits for every possible byte value, used as a popcount table
+_POPCOUNT_TABLE = np.array([bin(i).count("1") for i in range(256)], dtype=np.uint8)
+
+# Transactions packed per write of an incidence file
+INCIDENCE_WRITE_CHUNK = 1 << 16
+
+# Default incidence files kept in the temp dir, the least recently used beyond this are deleted
+INCIDENCE_KEEP_FILES = 32
+
+# Bytes of every item row read per counting pass over an incidence file (8 transactions per byte)
+INCIDENCE_READ_CHUNK = 1 << 14
+
+
+def build_item_bitsets(transactions):
+    """Encode every item as a bit-packed column over the transactions"""
+    item_rows = {}
+    for tid, transaction in enumerate(transactions):
+        for item in transaction:
+            item_rows.setdefault(item, []).append(tid)
+
+    total_transactions = len(transactions)
+    bitsets = {}
+    for item, rows in item_rows.items():
+        column = np.zeros(total_transactions, dtype=bool)
+        column[rows] = True
+        bitsets[item] = np.packbits(column)
+    return bitsets
+
+
+def popcount(bits):
+    """Count the set bits of a packed bitset"""
+    return int(_POPCOUNT_TABLE[bits].sum())
+
+
+def bitset_support_count(bitsets, itemset):
+    """Support count of an itemset as the popcount of its AND-ed item columns"""
+    items = iter(itemset)
+    bits = bitsets[next(items)].copy()
+    for item in items:
+        np.bitwise_and(bits, bitsets[item], out=bits)
+    return popcount(bits)
+
+
+def hoeffding_epsilon(sample_size, delta):
+    """Half-width of the two-sided Hoeffding bound on a support estimated from sample_size transactions"""
+    # P(|sampled support - true support| >= epsilon) <= 2 exp(-2 n epsilon^2) = delta
+    return math.sqrt(math.log(2 / delta) / (2 * sample_size))
+
+
+def is_frequent(count, total_transactions, min_support):
+    """Whether a support count passes min_support, an itemset no transaction holds never does"""
+    return count > 0 and count / total_transactions >= min_support
+
+
+def min_support_count(min_support, total_transactions):
+    """Smallest count whose support passes is_frequent"""
+    count = max(int(math.ceil(min_support * total_transactions)), 1)
+    while count > 1 and (count - 1) / total_transactions >= min_support:
+        count -= 1
+    while count / total_transactions < min_support:
+        count += 1
+    return count
+
+
+def apriori_gen(frequent_keys):
+    """Join sorted (k-1)-itemsets sharing a prefix, pruning candidates with an infrequent (k-1)-subset"""
+    frequent = set(frequent_keys)
+    tails_by_prefix = {}
+    for key in sorted(frequent_keys):
+        tails_by_prefix.setdefault(key[:-1], []).append(key[-1])
+
+    candidates = []
+    pruned = 0
+    for prefix, tails in tails_by_prefix.items():
+        for i, first in enumerate(tails):
+            for second in tails[i + 1:]:
+                candidate = prefix + (first, second)
+                # Dropping either of the last two items gives the joined itemsets, check the others
+                if all(candidate[:idx] + candidate[idx + 1:] in frequent for idx in range(len(candidate) - 2)):
+                    candidates.append(candidate)
+                else:
+                    pruned += 1
+    return candidates, pruned
+
+
+class MiningBudgetExceeded(Exception):
+    """Raised inside FP-Growth when the mining budget runs out, carrying the reason"""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class MiningBudget:
+    """Limits on itemset length, wall-clock time, counted candidates and their estimated memory"""
+
+    def __init__(self, max_length=None, time_budget=None, max_candidates=None, max_memory_mb=None):
+        self.max_length = max_length
+        self.time_budget = time_budget
+        self.max_candidates = max_candidates
+        self.max_memory_mb = max_memory_mb
+        self.deadline = None
+        self.counted = 0
+        # Set when FP-Growth skipped a frequent itemset longer than max_length
+        self.length_capped = False
+
+    def start(self):
+        self.deadline = time.monotonic() + self.time_budget if self.time_budget else None
+        self.counted = 0
+        self.length_capped = False
+
+    def expired(self):
+        return self.deadline is not None and time.monotonic() > self.deadline
+
+    def exceeded(self, level, candidates):
+        """Reason counting candidates more itemsets of this level would break the budget, or None"""
+        if self.max_length is not None and level > self.max_length:
+            return "max_length"
+        if self.expired():
+            return "deadline"
+        if self.max_candidates is not None and self.counted + candidates > self.max_candidates:
+            return "max_candidates"
+        if self.max_memory_mb is not None and \
+                (self.counted + candidates) * _CANDIDATE_BYTES > self.max_memory_mb * 2 ** 20:
+            return "memory"
+        return None
+
+
+class FPNode:
+    __slots__ = ("item", "count", "parent", "children")
+
+    def __init__(self, item, parent):
+        self.item = item
+        self.count = 0
+        self.parent = parent
+        self.children = {}
+
+
+def build_fp_tree(weighted_transactions, min_count):
+    """Build an FP-tree and its header table from (items, count) pairs"""
+    item_counts = {}
+    for items, count in weighted_transactions:
+        for item in items:
+            item_counts[item] = item_counts.get(item, 0) + count
+    frequent = {item: count for item, count in item_counts.items() if count >= min_count}
+
+    root = FPNode(None, None)
+    header = {}
+    for items, count in weighted_transactions:
+        # Insert frequent items by descending count so common prefixes share nodes
+        path = sorted((item for item in items if item in frequent), key=lambda item: (-frequent[item], item))
+        node = root
+        for item in path:
+            child = node.children.get(item)
+            if child is None:
+                child = FPNode(item, node)
+                node.children[item] = child
+                header.setdefault(item, []).append(child)
+            child.count += count
+            node = child
+    return header, frequent
+
+
+def fp_growth(weighted_transactions, min_count, suffix=(), itemset_counts=None, budget=None):
+    """Mine every frequent itemset with FP-Growth, returning {item tuple: count}"""
+    if itemset_counts is None:
+        itemset_counts = {}
+    header, frequent = build_fp_tree(weighted_transactions, min_count)
+    for item, nodes in header.items():
+        itemset = suffix + (item,)
+        if budget is not None and len(itemset) > 1:
+            # Longer itemsets are skipped without losing any shorter one, other limits end the run
+            if budget.max_length is not None and len(itemset) > budget.max_length:
+                budget.length_capped = True
+                continue
+            reason = budget.exceeded(len(itemset), 1)
+            if reason is not None:
+                raise MiningBudgetExceeded(reason)
+            budget.counted += 1
+        itemset_counts[itemset] = frequent[item]
+
+        # Conditional pattern base: prefix paths leading to this item
+        pattern_base = []
+        for node in nodes:
+            path = []
+            parent = node.parent
+            while parent.item is not None:
+                path.append(parent.item)
+                parent = parent.parent
+            if path:
+                pattern_base.append((path, node.count))
+        if pattern_base:
+            fp_growth(pattern_base, min_count, itemset, itemset_counts, budget)
+    return itemset_counts
+
+
+def transaction_increment(previous, current):
+    """Transactions of current that are not in previous, or None if any previous transaction is gone"""
+    remaining = Counter(tuple(transaction) for transaction in current)
+    remaining.subtract(tuple(transaction) for transaction in previous)
+    if any(count < 0 for count in remaining.values()):
+        return None
+    return [list(transaction) for transaction, count in remaining.items() for _ in range(count)]
+
+
+def transaction_fingerprint(transactions):
+    """Hash identifying a transaction list, items and order included"""
+    digest = hashlib.sha256()
+    for transaction in transactions:
+        digest.update("\x1f".join(map(str, transaction)).encode("utf-8"))
+        digest.update(b"\x1e")
+    return digest.hexdigest()
+
+
+def incidence_items_path(path):
+    """Sidecar file holding the item labels and transaction count of an incidence file"""
+    return os.path.splitext(path)[0] + ".items.json"
+
+
+def default_incidence_path(transactions, item_dictionary=None):
+    """Temp file path for the incidence matrix of a transaction list, shared by identical lists
+
+    Rows are numbered by item_dictionary extended with the items it lacks, so a dictionary
+    already holding items gets its own file and keeps its ids.
+    """
+    key = transaction_fingerprint(transactions)
+    if item_dictionary is not None and len(item_dictionary):
+        key = hashlib.sha256((key + json.dumps(item_dictionary.items, default=str)).encode("utf-8")).hexdigest()
+    return os.path.join(tempfile.gettempdir(), f"wisrule_{key[:16]}.npy")
+
+
+def write_incidence_file(transactions, path, item_dictionary=None, chunk_size=INCIDENCE_WRITE_CHUNK):
+    """Write transactions once as an item-major bit-packed incidence matrix in a memory-mapped .npy file
+
+    transactions is read twice, once for the vocabulary and row count and once to pack the rows,
+    so it must be re-iterable: a list, or an object whose __iter__ streams the rows afresh each time.
+    """
+    if iter(transactions) is transactions:
+        raise TypeError("transactions is read twice, pass a re-iterable such as a list rather than an iterator")
+    if item_dictionary is None:
+        item_dictionary = ItemDictionary()
+    total_transactions = 0
+    for transaction in transactions:
+        for item in transaction:
+            item_dictionary.encode(item)
+        total_transactions += 1
+
+    # Written beside the target and swapped in, so a reader never maps a half-written file
+    temp_path = write_incidence_temp(path, lambda temp: write_incidence_rows(
+        transactions, temp, item_dictionary, total_transactions, chunk_size))
+    # Without its sidecar no reader pairs the new rows with old item labels, the sidecar goes last
+    # and its presence marks a complete file
+    try:
+        os.remove(incidence_items_path(path))
+    except FileNotFoundError:
+        pass
+    os.replace(temp_path, path)
+    meta = {"items": item_dictionary.items, "transaction_count": total_transactions}
+
+    def write_meta(temp):
+        with open(temp, "w", encoding="utf-8") as items_file:
+            json.dump(meta, items_file)
+
+    os.replace(write_incidence_temp(path, write_meta), incidence_items_path(path))
+    return item_dictionary, total_transactions
+
+
+def write_incidence_temp(path, write):
+    """Temp file beside path filled by write(temp_path), removed again if writing fails"""
+    handle, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)),
+                                         prefix=os.path.basename(path) + ".", suffix=".tmp")
+    os.close(handle)
+    try:
+        write(temp_path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
+    return temp_path
+
+
+def write_incidence_rows(transactions, path, item_dictionary, total_transactions, chunk_size):
+    incidence = np.lib.format.open_memmap(path, mode="w+", dtype=np.uint8,
+                                          shape=(len(item_dictionary), (total_transactions + 7) // 8))
+    transaction_iter = iter(transactions)
+    start = 0
+    while start < total_transactions:
+        chunk = list(islice(transaction_iter, chunk_size))
+        if not chunk:
+            raise ValueError(f"transactions yielded {start} rows on the second pass, {total_transactions} on the first")
+        item_ids = item_dictionary.item_ids
+        rows = np.fromiter((item_ids[item] for transaction in chunk for item in transaction), dtype=np.intp)
+        tids = np.fromiter((tid for tid, transaction in enumerate(chunk, start) for _ in transaction), dtype=np.intp,
+                           count=len(rows))
+        # Set each (item, transaction) bit in place, packbits order with the first transaction in the high bit,
+        # so memory grows with the chunk's items and never with the vocabulary
+        np.bitwise_or.at(incidence, (rows, tids >> 3), (0x80 >> (tids & 7)).astype(np.uint8))
+        start += len(chunk)
+    incidence.flush()
+    del incidence
+
+
+def reuse_incidence_file(path):
+    """Mark a complete incidence file as just used, False when there is none at path"""
+    try:
+        os.utime(incidence_items_path(path))
+        os.utime(path)
+    except FileNotFoundError:
+        return False
+    return True
+
+
+def prune_incidence_files(directory, keep=INCIDENCE_KEEP_FILES):
+    """Delete all but the keep most recently used default incidence files of a directory"""
+    def used_at(path):
+        try:
+            return os.path.getmtime(path)
+        except OSError:
+            return 0
+
+    paths = sorted(glob.glob(os.path.join(directory, "wisrule_*.npy")), key=used_at, reverse=True)
+    for path in paths[keep:]:
+        # Sidecar first, so the file stops being offered for reuse before it goes
+        for stale in (incidence_items_path(path), path):
+            try:
+                os.remove(stale)
+            except OSError:
+                # Gone already, or still mapped by a process on a platform that refuses the delete
+                pass
+
+
+def read_incidence_file(path):
+    """Memory-mapped incidence matrix, item dictionary and transaction count of an incidence file"""
+    with open(incidence_items_path(path), encoding="utf-8") as items_file:
+        meta = json.load(items_file)
+    item_dictionary = ItemDictionary()
+    for item in meta["items"]:
+        item_dictionary.encode(item)
+    return np.load(path, mmap_mode="r"), item_dictionary, meta["transaction_count"]
+
+
+def incidence_support_counts(incidence, itemsets, chunk_bytes=INCIDENCE_READ_CHUNK):
+    """Support counts of itemsets, streaming byte chunks of only the item rows they use"""
+    counts = [0] * len(itemsets)
+    if not itemsets:
+        return counts
+    rows = sorted(set().union(*itemsets))
+    position = {item: pos for pos, item in enumerate(rows)}
+    members = [[position[item] for item in itemset] for itemset in itemsets]
+    for start in range(0, incidence.shape[1], chunk_bytes):
+        # Fancy indexing copies just this slice of the mapped rows into memory
+        block = incidence[rows, start:start + chunk_bytes]
+        for idx, member in enumerate(members):
+            counts[idx] += popcount(np.bitwise_and.reduce(block[member], axis=0))
+    return counts
+
+
+def increment_support_count(bitsets, itemset):
+    """Support count of an itemset within an increment, zero when one of its items never occurs there"""
+    if any(item not in bitsets for item in itemset):
+        return 0
+    return bitset_support_count(bitsets, itemset)
+
+
+# Rule evaluation state installed in each worker process of the rule pool
+_rule_worker = None
+
+
+def init_rule_worker(miner):
+    """Keep the miner state sent to this worker process for all its chunks"""
+    global _rule_worker
+    _rule_worker = miner
+
+
+def evaluate_itemset_chunk(itemsets):
+    """Evaluate the rules of a chunk of itemsets inside a worker process"""
+    _rule_worker.rules = []
+    for itemset in itemsets:
+        _rule_worker.evaluate_itemset(itemset)
+    return _rule_worker.rules
+
+
+class ItemDictionary:
+    """Dense integer ids for transaction items, assigned in first-seen order"""
+
+    def __init__(self):
+        self.item_ids = {}
+        self.items = []
+
+    def __len__(self):
+        return len(self.items)
+
+    def encode(self, item):
+        idx = self.item_ids.get(item)
+        if idx is None:
+            idx = len(self.items)
+            self.item_ids[item] = idx
+            self.items.append(item)
+        return idx
+
+    def encode_transactions(self, transactions):
+        """Encode transactions as compact unsigned arrays, 16-bit while the vocabulary allows it"""
+        encoded = [[self.encode(item) for item in transaction] for transaction in transactions]
+        typecode = "H" if len(self.items) <= 0x10000 else "I"
+        return [array(typecode, transaction) for transaction in encoded]
+
+    def decode(self, itemset):
+        """Item labels of an encoded itemset"""
+        return frozenset(self.items[idx] for idx in itemset)
+
+    def copy(self):
+        dictionary = ItemDictionary()
+        dictionary.item_ids = dict(self.item_ids)
+        dictionary.items = list(self.items)
+        return dictionary
+
+
+class WisRuleWithNegative:
+    def __init__(self, transactions, min_support=0.15, min_confidence=0.3, min_utility=0.1,
+                 counting_engine="horizontal", mining_algorithm="apriori", rule_workers=1, itemset_mode="all",
+                 incidence_path=None, sample_size=None, sample_delta=0.05, verify_sample=False, sample_seed=None,
+                 max_length=None, time_budget=None, max_candidates=None, max_memory_mb=None):
+        if counting_engine not in COUNTING_ENGINES:
+            raise ValueError(f"Unknown counting engine '{counting_engine}', expected one of {COUNTING_ENGINES}")
+        if mining_algorithm not in MINING_ALGORITHMS:
+            raise ValueError(f"Unknown mining algorithm '{mining_algorithm}', expected one of {MINING_ALGORITHMS}")
+        if itemset_mode not in ITEMSET_MODES:
+            raise ValueError(f"Unknown itemset mode '{itemset_mode}', expected one of {ITEMSET_MODES}")
+        if counting_engine == "mmap" and mining_algorithm != "apriori":
+            raise ValueError("The mmap counting engine only supports the apriori mining algorithm")
+        if transactions is None and incidence_path is None:
+            raise ValueError("Either transactions or an incidence_path is required")
+        # Approximate mode mines a uniform sample at a support lowered by the Hoeffding error, so an
+        # itemset frequent over all transactions is missed with probability at most sample_delta
+        self.approximate = False
+        self.verify_sample = verify_sample
+        self.verified = False
+        self.population = None
+        self.sample_size = None
+        self.target_support = min_support
+        self.support_error = 0
+        if sample_size is not None and transactions is not None and 0 < sample_size < len(transactions):
+            rows = sorted(random.Random(sample_seed).sample(range(len(transactions)), int(sample_size)))
+            self.population = transactions
+            transactions = [transactions[row] for row in rows]
+            self.sample_size = len(transactions)
+            self.approximate = True
+            self.support_error = hoeffding_epsilon(len(transactions), sample_delta)
+            min_support = max(min_support - self.support_error, 0)
+        self.transactions = transactions if transactions is not None else []
+        # Items are mined as dense integer ids and only decoded back to labels by get_rules
+        self.item_dictionary = ItemDictionary()
+        # Memory-mapped item-major incidence matrix, only opened for the mmap engine
+        self.incidence = None
+        self.incidence_path = incidence_path
+        if counting_engine == "mmap":
+            # Supports are streamed from disk, so no encoded copy of the transactions is kept
+            self.encoded_transactions = []
+            self.open_incidence(transactions)
+        else:
+            self.encoded_transactions = self.item_dictionary.encode_transactions(transactions)
+        self.min_support = min_support
+        self.min_confidence = min_confidence
+        self.min_utility = min_utility
+        self.counting_engine = counting_engine
+        self.mining_algorithm = mining_algorithm
+        self.itemset_mode = itemset_mode
+        # Worker processes used by generate_rules, 1 keeps rule evaluation serial
+        self.rule_workers = max(int(rule_workers), 1)
+        self.item_support = {}
+        self.rules = []
+        if self.incidence is None:
+            self.total_transactions = len(transactions)
+        # Bit-packed item columns, only built for the bitset engine
+        self.bitsets = None
+        # Per-level candidate statistics from the last run
+        self.level_stats = []
+        # Support count of every itemset counted so far, shared by all rule metrics
+        self.support_counts = {}
+        # Itemsets considered and evaluated by the last generate_top_rules run
+        self.top_k_stats = {}
+        # Execution budget of generate_frequent_itemsets, a run that hits it keeps its completed levels
+        self.budget = MiningBudget(max_length, time_budget, max_candidates, max_memory_mb)
+        self.truncated = False
+        self.truncation_reason = None
+        self.completed_level = 0
+        # Dictionary to store utility metrics for calculations
+        self.utility_dict = {
+            "transaction_count": self.total_transactions,
+            "item_counts": {},
+            "itemset_counts": {}
+        }
+
+    @classmethod
+    def from_incidence_file(cls, incidence_path, min_support=0.15, min_confidence=0.3, min_utility=0.1, **options):
+        """Miner over an incidence file written by write_incidence_file, never loading the transactions"""
+        return cls(None, min_support, min_confidence, min_utility, counting_engine="mmap",
+                   incidence_path=incidence_path, **options)
+
+    def open_incidence(self, transactions):
+        """Write the transactions to the incidence file unless it already holds them, then map it"""
+        if transactions is not None and self.incidence_path is None:
+            path = default_incidence_path(transactions, self.item_dictionary)
+            # The default path is keyed by the transactions and the ids already assigned, so an existing file is reused
+            if reuse_incidence_file(path):
+                try:
+                    self.incidence, self.item_dictionary, self.total_transactions = read_incidence_file(path)
+                    self.incidence_path = path
+                    return
+                except FileNotFoundError:
+                    # Pruned by another process in between, write it again
+                    pass
+            write_incidence_file(transactions, path, self.item_dictionary)
+            prune_incidence_files(os.path.dirname(path))
+            self.incidence_path = path
+        elif transactions is not None:
+            write_incidence_file(transactions, self.incidence_path, self.item_dictionary)
+        self.incidence, self.item_dictionary, self.total_transactions = read_incidence_file(self.incidence_path)
+
+    def count_items(self):
+        """Count the occurrences of every single item"""
+        if self.incidence is not None:
+            singles = [frozenset([idx]) for idx in range(len(self.item_dictionary))]
+            return dict(zip(singles, incidence_support_counts(self.incidence, singles)))
+        if self.counting_engine == "bitset":
+            self.bitsets = build_item_bitsets(self.encoded_transactions)
+            return {frozenset([item]): popcount(bits) for item, bits in self.bitsets.items()}
+
+        item_counts = {}
+        for transaction in self.encoded_transactions:
+            for item in transaction:
+                item_counts[frozenset([item])] = item_counts.get(frozenset([item]), 0) + 1
+        return item_counts
+
+    def count_candidates(self, candidates):
+        """Count the transactions containing each candidate itemset"""
+        if self.incidence is not None:
+            return dict(zip(candidates, incidence_support_counts(self.incidence, candidates)))
+        if self.counting_engine == "bitset":
+            return {candidate: bitset_support_count(self.bitsets, candidate) for candidate in candidates}
+
+        candidate_counts = {candidate: 0 for candidate in candidates}
+        for transaction in self.encoded_transactions:
+            transaction_set = frozenset(transaction)
+            for candidate in candidates:
+                if candidate.issubset(transaction_set):
+                    candidate_counts[candidate] += 1
+        return candidate_counts
+
+    def generate_frequent_itemsets(self):
+        total_transactions = self.total_transactions
+        self.budget.start()
+        self.truncated = False
+        self.truncation_reason = None
+        # Count occurrences of each item
+        item_counts = self.count_items()
+
+        # Store item counts in utility dictionary for later use
+        self.utility_dict["item_counts"] = {next(iter(item)): count for item, count in item_counts.items()}
+        self.support_counts = dict(item_counts)
+
+        # Filter by minimum support
+        self.item_support = {
+            item: count / total_transactions
+            for item, count in item_counts.items()
+            if is_frequent(count, total_transactions, self.min_support)
+        }
+
+        self.level_stats = [{
+            "level": 1, "candidates": len(item_counts), "pruned": 0, "frequent": len(self.item_support)
+        }]
+
+        if self.mining_algorithm == "fpgrowth":
+            self.fpgrowth_itemsets()
+        else:
+            self.apriori_itemsets()
+        self.completed_level = self.level_stats[-1]["level"]
+        if self.approximate and self.verify_sample:
+            self.verify_itemsets()
+
+    def truncate(self, reason):
+        """Mark the run as stopped early by the budget"""
+        self.truncated = True
+        self.truncation_reason = reason
+
+    def count_candidates_within_budget(self, candidates):
+        """Candidate counts, or None when the deadline passes before every candidate is counted"""
+        if self.budget.deadline is None:
+            return self.count_candidates(candidates)
+        candidate_counts = {}
+        for start in range(0, len(candidates), _DEADLINE_CHUNK):
+            if self.budget.expired():
+                return None
+            candidate_counts.update(self.count_candidates(candidates[start:start + _DEADLINE_CHUNK]))
+        return candidate_counts
+
+    def verify_itemsets(self):
+        """Exact pass over all transactions confirming the itemsets mined from the sample"""
+        # Recount every sampled count so rule metrics of the survivors are exact as well
+        encoded_population = self.item_dictionary.encode_transactions(self.population)
+        population_bits = build_item_bitsets(encoded_population)
+        total_transactions = len(self.population)
+        self.support_counts = {
+            itemset: increment_support_count(population_bits, itemset) for itemset in self.support_counts
+        }
+
+        self.transactions = self.population
+        self.total_transactions = total_transactions
+        self.min_support = self.target_support
+        if self.incidence is None:
+            self.encoded_transactions = encoded_population
+            if self.counting_engine == "bitset":
+                self.bitsets = population_bits
+        else:
+            self.incidence_path = None
+            self.open_incidence(self.population)
+        self.utility_dict["transaction_count"] = total_transactions
+        self.utility_dict["item_counts"] = {
+            next(iter(itemset)): count for itemset, count in self.support_counts.items() if len(itemset) == 1
+        }
+        for itemset in self.utility_dict["itemset_counts"]:
+            self.utility_dict["itemset_counts"][itemset] = self.support_counts[itemset]
+        self.item_support = {
+            itemset: self.support_counts[itemset] / total_transactions for itemset in self.item_support
+            if is_frequent(self.support_counts[itemset], total_transactions, self.min_support)
+        }
+        self.verified = True
+
+    def apriori_itemsets(self):
+        """Grow the frequent single items level by level with prefix-join candidates"""
+        total_transactions = self.total_transactions
+        current_keys = [tuple(item) for item in self.item_support]
+        k = 2
+
+        # Generate larger itemsets iteratively
+        while current_keys:
+            candidate_keys, pruned = apriori_gen(current_keys)
+            # Stop at the deepest completed level rather than start a level the budget cannot afford
+            reason = self.budget.exceeded(k, len(candidate_keys)) if candidate_keys else None
+            if reason is not None:
+                self.truncate(reason)
+                break
+            new_candidates = [frozenset(key) for key in candidate_keys]
+            # Count occurrences of each candidate itemset
+            candidate_counts = self.count_candidates_within_budget(new_candidates)
+            if candidate_counts is None:
+                self.truncate("deadline")
+                break
+            self.budget.counted += len(candidate_keys)
+
+            current_keys = []
+            for key, candidate in zip(candidate_keys, new_candidates):
+                count = candidate_counts[candidate]
+                # Store itemset counts in utility dictionary
+                self.utility_dict["itemset_counts"][candidate] = count
+                self.support_counts[candidate] = count
+                if is_frequent(count, total_transactions, self.min_support):
+                    self.item_support[candidate] = count / total_transactions
+                    current_keys.append(key)
+
+            self.level_stats.append({
+                "level": k, "candidates": len(candidate_keys), "pruned": pruned, "frequent": len(current_keys)
+            })
+            k += 1
+
+    def fpgrowth_itemsets(self):
+        """Mine the larger frequent itemsets from an FP-tree without enumerating infrequent candidates"""
+        total_transactions = self.total_transactions
+        min_count = min_support_count(self.min_support, total_transactions)
+
+        weighted_transactions = [(list(dict.fromkeys(transaction)), 1) for transaction in self.encoded_transactions]
+        try:
+            mined = fp_growth(weighted_transactions, min_count, budget=self.budget)
+        except MiningBudgetExceeded as exceeded:
+            # FP-Growth does not finish levels in order, so only the single items are complete
+            self.truncate(exceeded.reason)
+            return
+        if self.budget.length_capped:
+            self.truncate("max_length")
+        itemset_counts = {tuple(sorted(key)): count for key, count in mined.items() if len(key) > 1}
+
+        # Store levels in order, each one sorted by item id like the Apriori join
+        for key in sorted(itemset_counts, key=lambda key: (len(key), key)):
+            count = itemset_counts[key]
+            itemset = frozenset(key)
+            self.utility_dict["itemset_counts"][itemset] = count
+            self.support_counts[itemset] = count
+            self.item_support[itemset] = count / total_transactions
+            if len(key) > self.level_stats[-1]["level"]:
+                self.level_stats.append({"level": len(key), "candidates": 0, "pruned": 0, "frequent": 0})
+            self.level_stats[-1]["frequent"] += 1
+
+    def update(self, new_transactions):
+        """Fold appended transactions into the mined itemsets and rules (FUP-style) without recounting"""
+        # Tracked counts (frequent itemsets plus the negative border of counted but infrequent
+        # candidates) only need their count in the increment. An untracked candidate was infrequent
+        # before, so it is counted over all transactions only if it is frequent within the increment.
+        new_transactions = list(new_transactions)
+        if not new_transactions:
+            return
+        if self.incidence is not None and self.total_transactions and not self.transactions:
+            raise ValueError("A miner opened from an incidence file has no transactions to extend")
+        if self.approximate:
+            raise ValueError("An approximate run cannot be updated, mine the sample again instead")
+        # The update is a run of its own, its rule generation gets a fresh deadline
+        self.budget.start()
+        # New items get ids after the existing ones
+        vocabulary_size = len(self.item_dictionary)
+        encoded_increment = self.item_dictionary.encode_transactions(new_transactions)
+        increment_bits = build_item_bitsets(encoded_increment)
+        increment_size = len(new_transactions)
+
+        self.transactions = list(self.transactions) + new_transactions
+        self.encoded_transactions = self.encoded_transactions + encoded_increment
+        self.total_transactions += increment_size
+        self.utility_dict["transaction_count"] = self.total_transactions
+        if self.counting_engine == "bitset":
+            self.bitsets = build_item_bitsets(self.encoded_transactions)
+        if self.incidence is not None:
+            # Rescans read the grown matrix, written once more under the new fingerprint
+            self.encoded_transactions = []
+            self.incidence_path = None
+            self.open_incidence(self.transactions)
+
+        # Advance every tracked count
+        for itemset in self.support_counts:
+            self.support_counts[itemset] += increment_support_count(increment_bits, itemset)
+        for idx in range(vocabulary_size, len(self.item_dictionary)):
+            self.support_counts[frozenset([idx])] = popcount(increment_bits[idx])
+        self.utility_dict["item_counts"] = {
+            idx: self.support_counts[frozenset([idx])] for idx in range(len(self.item_dictionary))
+        }
+
+        total_transactions = self.total_transactions
+        self.item_support = {}
+        current_keys = []
+        for idx in range(len(self.item_dictionary)):
+            count = self.support_counts[frozenset([idx])]
+            if is_frequent(count, total_transactions, self.min_support):
+                self.item_support[frozenset([idx])] = count / total_transactions
+                current_keys.append((idx,))
+        self.level_stats = [{
+            "level": 1, "candidates": len(self.item_dictionary), "pruned": 0, "frequent": len(current_keys)
+        }]
+
+        k = 2
+        while current_keys:
+            candidate_keys, pruned = apriori_gen(current_keys)
+            rescanned = 0
+            current_keys = []
+            for key in candidate_keys:
+                candidate = frozenset(key)
+                if candidate not in self.support_counts:
+                    # Infrequent before the increment, skip unless the increment alone makes it frequent
+                    if not is_frequent(increment_support_count(increment_bits, candidate), increment_size,
+                                       self.min_support):
+                        continue
+                    rescanned += 1
+                count = self.support_count(candidate)
+                self.utility_dict["itemset_counts"][candidate] = count
+                if is_frequent(count, total_transactions, self.min_support):
+                    self.item_support[candidate] = count / total_transactions
+                    current_keys.append(key)
+
+            self.level_stats.append({
+                "level": k, "candidates": len(candidate_keys), "pruned": pruned,
+                "rescanned": rescanned, "frequent": len(current_keys)
+            })
+            k += 1
+
+        # Keep itemset counts in step with the advanced tracked counts
+        for itemset in self.utility_dict["itemset_counts"]:
+            self.utility_dict["itemset_counts"][itemset] = self.support_counts[itemset]
+        self.generate_rules()
+
+    def filtered(self, min_support, min_confidence, min_utility):
+        """Copy of this run restricted to thresholds at or above the mined ones, without re-mining"""
+        # Supports and rule metrics only depend on counts, so raising a threshold is a pure filter
+        view = self.snapshot()
+        view.min_support = min_support
+        view.min_confidence = min_confidence
+        view.min_utility = min_utility
+        view.item_support = {itemset: support for itemset, support in self.item_support.items() if support >= min_support}
+        if self.itemset_mode == "maximal":
+            # Dropping supersets at a higher support can make a subset maximal, so re-derive the rules
+            view.budget.start()
+            view.generate_rules()
+            return view
+        # Closed itemsets stay closed at a higher support: an equal-support superset stays frequent
+        view.rules = [
+            rule for rule in self.rules
+            if rule[0].union(rule[2]) in view.item_support and rule[3] >= min_confidence and rule[5] >= min_utility
+        ]
+        return view
+
+    def snapshot(self):
+        """Copy of this run that later update() calls on either copy leave untouched"""
+        # Copy everything update() mutates in place, the rest is only ever rebound
+        view = copy.copy(self)
+        view.support_counts = dict(self.support_counts)
+        view.item_dictionary = self.item_dictionary.copy()
+        view.utility_dict = {key: dict(value) if isinstance(value, dict) else value
+                             for key, value in self.utility_dict.items()}
+        view.level_stats = [dict(stats) for stats in self.level_stats]
+        view.budget = copy.copy(self.budget)
+        return view
+
+    def rule_itemsets(self):
+        """Frequent itemsets of two or more items that rules are derived from under the itemset mode"""
+        itemsets = [itemset for itemset in self.item_support.keys() if len(itemset) > 1]
+        if self.itemset_mode == "all":
+            return itemsets
+
+        # Checking immediate supersets is enough for both closedness and maximality
+        has_superset = set()
+        has_equal_superset = set()
+        for itemset in itemsets:
+            count = self.support_counts[itemset]
+            for item in itemset:
+                subset = itemset - {item}
+                has_superset.add(subset)
+                if self.support_counts[subset] == count:
+                    has_equal_superset.add(subset)
+        redundant = has_superset if self.itemset_mode == "maximal" else has_equal_superset
+        return [itemset for itemset in itemsets if itemset not in redundant]
+
+    def generate_rules(self):
+        """Rules of the rule itemsets, cut short and truncated once the budget's deadline passes"""
+        self.rules = []
+        itemsets = self.rule_itemsets()
+        if self.rule_workers > 1 and len(itemsets) > 1:
+            self.rules = self.generate_rules_parallel(itemsets)
+            return
+        for itemset in itemsets:
+            if self.budget.expired():
+                self.truncate("rule_deadline")
+                return
+            self.evaluate_itemset(itemset)
+
+    def evaluate_itemset(self, itemset):
+        """Evaluate the positive and negative rule for every antecedent/consequent split"""
+        # Split in item id order so every process enumerates the same rules in the same order
+        for subset in self.powerset(sorted(itemset)):
+            if subset and subset != itemset:
+                antecedent = frozenset(subset)
+                consequent = itemset - antecedent
+                self.evaluate_rule(antecedent, consequent, positive=True)
+                self.evaluate_rule(antecedent, consequent, positive=False)
+
+    def rule_worker_state(self):
+        """Copy of the miner holding only what rule evaluation reads, cheap to send to a worker"""
+        state = copy.copy(self)
+        state.transactions = []
+        state.encoded_transactions = []
+        state.bitsets = None
+        state.incidence = None
+        state.rules = []
+        state.utility_dict = {"transaction_count": self.total_transactions, "item_counts": {}, "itemset_counts": {}}
+        return state
+
+    def generate_rules_parallel(self, itemsets):
+        """Shard the itemsets across a process pool and merge the rules in serial order"""
+        # A few chunks per worker keeps the pool balanced when split counts differ by itemset size
+        chunk_count = min(len(itemsets), self.rule_workers * 4)
+        chunk_size = math.ceil(len(itemsets) / chunk_count)
+        chunks = [itemsets[start:start + chunk_size] for start in range(0, len(itemsets), chunk_size)]
+
+        rules = []
+        with ProcessPoolExecutor(max_workers=self.rule_workers, initializer=init_rule_worker,
+                                 initargs=(self.rule_worker_state(),)) as executor:
+            # map yields chunk results in submission order, so the merge is deterministic
+            for done, chunk_rules in enumerate(executor.map(evaluate_itemset_chunk, chunks), start=1):
+                rules.extend(chunk_rules)
+                if done < len(chunks) and self.budget.expired():
+                    # Chunks not started yet are dropped, the rules kept are a prefix of the serial order
+                    executor.shutdown(wait=False, cancel_futures=True)
+                    self.truncate("rule_deadline")
+                    break
+        return rules
+
+    def support_count(self, itemset):
+        """Number of transactions containing the itemset, counted once and cached"""
+        count = self.support_counts.get(itemset)
+        if count is None:
+            if self.incidence is not None:
+                count = incidence_support_counts(self.incidence, [itemset])[0]
+            elif self.bitsets is not None:
+                count = bitset_support_count(self.bitsets, itemset)
+            else:
+                count = sum(1 for transaction in self.encoded_transactions if itemset.issubset(transaction))
+            self.support_counts[itemset] = count
+        return count
+
+    def joint_count(self, antecedent, consequent, positive=True):
+        """Transactions holding the antecedent together with (or, for negative rules, without) the consequent"""
+        joint = self.support_count(frozenset(antecedent.union(consequent)))
+        if positive:
+            return joint
+        # Antecedent present but consequent not fully present
+        return self.support_count(antecedent) - joint
+
+    def calculate_upii(self, antecedent, consequent, positive=True):
+        """Calculate Utility-based Probabilistic Interestingness Index (UPII)"""
+        ant_support = self.item_support.get(antecedent, 0)
+        cons_support = self.item_support.get(consequent, 0)
+
+        if not positive:
+            cons_support = 1 - cons_support
+
+        if ant_support == 0 or cons_support == 0:
+            return 0
+
+        # Calculate joint probability
+        joint_prob = self.joint_count(antecedent, consequent, positive) / self.total_transactions
+
+        # Calculate UPII
+        expected_prob = ant_support * cons_support
+        return (joint_prob - expected_prob) / max(joint_prob, expected_prob) if max(joint_prob, expected_prob) > 0 else 0
+
+    def calculate_lift(self, antecedent, consequent, positive=True):
+        """Calculate lift/interestingness"""
+        ant_support = self.item_support.get(antecedent, 0)
+        cons_support = self.item_support.get(consequent, 0)
+
+        if not positive:
+            cons_support = 1 - cons_support
+
+        if ant_support == 0 or cons_support == 0:
+            return 0
+
+        # Calculate joint probability
+        joint_prob = self.joint_count(antecedent, consequent, positive) / self.total_transactions
+
+        # Calculate lift
+        return joint_prob / (ant_support * cons_support) if (ant_support * cons_support) > 0 else 0
+
+    def calculate_wisval(self, confidence, lift, upii):
+        """Calculate WisVal - Wisdom Value metric"""
+        # Weighted combination of confidence, lift and UPII
+        conf_weight, lift_weight, upii_weight = WISVAL_WEIGHTS
+        return (conf_weight * confidence) + (lift_weight * lift) + (upii_weight * upii)
+
+    def evaluate_rule(self, antecedent, consequent, positive=True):
+        rule = self.score_rule(antecedent, consequent, positive)
+        if rule is not None:
+            self.rules.append(rule)
+
+    def score_rule(self, antecedent, consequent, positive=True, wisval_floor=None):
+        """Rule tuple for one split, or None if it misses the thresholds or cannot beat wisval_floor"""
+        if not consequent:
+            return None
+
+        antecedent_support = self.item_support.get(antecedent, 0)
+        consequent_support = self.item_support.get(consequent, 0)
+
+        # Calculate confidence
+        if positive:
+            confidence = antecedent_support
+            rule_type = "Positive"
+            complement_support = consequent_support
+        else:
+            complement_support = 1 - consequent_support
+            confidence = antecedent_support * complement_support
+            rule_type = "Negative"
+
+        # Calculate traditional utility
+        if positive:
+            utility = confidence / consequent_support if consequent_support > 0 else 0
+        else:
+            utility = confidence / complement_support if complement_support > 0 else 0
+
+        # Only keep rules that meet the minimum thresholds
+        if confidence < self.min_confidence or utility < self.min_utility:
+            return None
+
+        # Calculate advanced metrics
+        lift = self.calculate_lift(antecedent, consequent, positive)
+        if wisval_floor is not None and self.calculate_wisval(confidence, lift, 1) + _BOUND_SLACK < wisval_floor:
+            # Even a perfect UPII of 1 cannot lift this rule into the top k
+            return None
+        upii = self.calculate_upii(antecedent, consequent, positive)
+        wisval = self.calculate_wisval(confidence, lift, upii)
+
+        return (antecedent, "¬" if not positive else "", consequent, confidence,
+                rule_type, utility, lift, upii, wisval)
+
+    def wisval_bound(self, itemset):
+        """Upper bound on the WisVal of any positive or negative rule split from the itemset"""
+        total_transactions = self.total_transactions
+        itemset_support = self.support_count(itemset) / total_transactions
+        if itemset_support == 0:
+            # The bounds below divide by s(I), and a negative rule of an itemset no transaction holds
+            # can still score well, so such an itemset is never skipped
+            return math.inf
+        item_supports = [self.support_count(frozenset([item])) / total_transactions for item in itemset]
+        max_support = max(item_supports)
+
+        # Any split A -> B has A inside I minus some b in B and B inside I minus some a in A, so
+        # s(A) * s(B) is at least the product of the two smallest (k-1)-subset supports
+        subset_supports = sorted(self.support_count(itemset - {item}) / total_transactions for item in itemset)
+        min_product = subset_supports[0] * subset_supports[1]
+
+        # Positive: confidence = s(A) <= max item support, lift = s(I) / (s(A) s(B)),
+        # UPII = 1 - s(A) s(B) / s(I) when it is positive
+        positive_bound = self.calculate_wisval(max_support, itemset_support / min_product,
+                                               max(1 - min_product / itemset_support, 0))
+
+        # Negative: a consequent with support 1 scores 0, otherwise s(B) is at most the largest item
+        # support below 1, lift = (1 - s(I) / s(A)) / (1 - s(B)) and UPII <= s(B)
+        partial_supports = [support for support in item_supports if support < 1]
+        if partial_supports:
+            max_partial = max(partial_supports)
+            negative_bound = self.calculate_wisval(max_support * (1 - itemset_support),
+                                                   (1 - itemset_support / max_support) / (1 - max_partial),
+                                                   max_partial)
+        else:
+            negative_bound = 0
+        return max(positive_bound, negative_bound) + _BOUND_SLACK
+
+    def generate_top_rules(self, top_k):
+        """Keep only the top_k rules by WisVal, skipping itemsets and splits that cannot reach them"""
+        itemsets = self.rule_itemsets()
+        # Visit the most promising itemsets first so the heap floor rises quickly
+        bounds = sorted(((self.wisval_bound(itemset), idx) for idx, itemset in enumerate(itemsets)),
+                        key=lambda bound: (-bound[0], bound[1]))
+
+        # Min-heap of (wisval, reversed serial position, rule), the worst kept rule sits on top
+        heap = []
+        evaluated = 0
+        for bound, idx in bounds:
+            if len(heap) >= top_k and bound < heap[0][0]:
+                break
+            if self.budget.expired():
+                self.truncate("rule_deadline")
+                break
+            evaluated += 1
+            itemset = itemsets[idx]
+            for split_idx, subset in enumerate(self.powerset(sorted(itemset))):
+                antecedent = frozenset(subset)
+                consequent = itemset - antecedent
+                for sign, positive in enumerate((True, False)):
+                    wisval_floor = heap[0][0] if len(heap) >= top_k else None
+                    rule = self.score_rule(antecedent, consequent, positive, wisval_floor)
+                    if rule is None:
+                        continue
+                    # Ties keep the rule generate_rules would have emitted first
+                    entry = (rule[8], (-idx, -split_idx, -sign), rule)
+                    if len(heap) < top_k:
+                        heapq.heappush(heap, entry)
+                    elif entry[:2] > heap[0][:2]:
+                        heapq.heapreplace(heap, entry)
+
+        self.top_k_stats = {"itemsets": len(itemsets), "evaluated": evaluated}
+        self.rules = [entry[2] for entry in sorted(heap, key=lambda entry: (-entry[0], [-pos for pos in entry[1]]))]
+        return self.get_rules()
+
+    def get_rules(self):
+        """Rules with antecedent and consequent decoded back to item labels for display"""
+        decode = self.item_dictionary.decode
+        return [
+            (decode(antecedent), negation, decode(consequent)) + tuple(metrics)
+            for antecedent, negation, consequent, *metrics in self.rules
+        ]
+
+    def full_rule_metrics(self, context_values=None, normal_range=(0, 100), weights=(0.25, 0.25, 0.25, 0.25)):
+        """evaluate_full_rule metrics of every mined rule, size-based utilities taken from the counted supports
+
+        Negative rules are scored on the complement of their consequent, context_values adjusts
+        the support of each rule in turn and is left out by default.
+        """
+        decode = self.item_dictionary.decode
+        support_dict = {decode(itemset): support for itemset, support in self.item_support.items()}
+        pairs = [(decode(antecedent), decode(consequent)) for antecedent, _, consequent, *_ in self.rules]
+        negative = [negation == "¬" for _, negation, *_ in self.rules]
+        return evaluate_full_rules(pairs, support_dict, utility_dict_from_supports(support_dict), context_values,
+                                   normal_range, weights, negative)
+
+    @staticmethod
+    def powerset(itemset):
+        return [set(comb) for i in range(1, len(itemset)) for comb in combinations(itemset, i)]
+
+
+class WisRuleCache:
+    """LRU cache of mining runs keyed by transaction fingerprint and itemset mode, answering higher thresholds by filtering"""
+
+    def __init__(self, max_entries=16):
+        self.max_entries = max_entries
+        self.entries = OrderedDict()
+        # Shared by every Streamlit session thread of the process
+        self.lock = threading.Lock()
+
+    def lookup(self, key, min_support, min_confidence, min_utility):
+        """Filtered copy of a cached run mined at or below the thresholds, or None"""
+        with self.lock:
+            miner = self.entries.get(key)
+            if miner is None or min_support < miner.min_support or min_confidence < miner.min_confidence \
+                    or min_utility < miner.min_utility:
+                return None
+            self.entries.move_to_end(key)
+        return miner.filtered(min_support, min_confidence, min_utility)
+
+    def store(self, miner, key=None):
+        """Keep a snapshot of a mined run, evicting the least recently used entry when full
+
+        key defaults to the fingerprint of the miner's transactions. A run extended by update()
+        holds the increment after the earlier transactions, so store it under the key of the
+        transaction list it answers for.
+        """
+        if key is None:
+            key = (transaction_fingerprint(miner.transactions), miner.itemset_mode)
+        snapshot = miner.snapshot()
+        with self.lock:
+            self.entries[key] = snapshot
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def cached(self, key):
+        with self.lock:
+            return self.entries.get(key)
+
+    def mine(self, transactions, min_support, min_confidence, min_utility, **options):
+        """Mined run for the thresholds, served from the cache whenever a lower-threshold run exists"""
+        key = (transaction_fingerprint(transactions), options.get("itemset_mode", "all"))
+        miner = self.lookup(key, min_support, min_confidence, min_utility)
+        if miner is not None:
+            return miner
+
+        # Mine at the loosest thresholds seen so later queries in either direction can reuse it
+        thresholds = (min_support, min_confidence, min_utility)
+        cached = self.cached(key)
+        if cached is not None:
+            thresholds = (min(min_support, cached.min_support), min(min_confidence, cached.min_confidence),
+                          min(min_utility, cached.min_utility))
+        miner = WisRuleWithNegative(transactions, *thresholds, **options)
+        miner.generate_frequent_itemsets()
+        miner.generate_rules()
+        if miner.truncated:
+            # A partial run cannot answer other thresholds, so it is never cached
+            return miner.filtered(min_support, min_confidence, min_utility)
+        self.store(miner, key)
+        # Filtered from this run rather than looked up again, another thread may evict it meanwhile
+        return miner.filtered(min_support, min_confidence, min_utility)
+
+
+# Process-wide cache shared by every session of the Wisdom Mining page
+wisrule_cache = WisRuleCache()
@@ -0,0 +1,185 @@
+"""Headless WisRule batch runner
+
+Mines every table x parameter combination in a process pool and writes the rules to
+CSV, Parquet or the wisrule_results store, e.g. from the Streamlit_Dashboards folder:
+
+    python -m utils.wisrule_batch annual_electricity_data --min-support 0.2 0.3 --output rules.csv
+"""
+import argparse
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from utils.wisrule import COUNTING_ENGINES, ITEMSET_MODES, MINING_ALGORITHMS, WisRuleWithNegative, transaction_fingerprint
+from utils.wisrule_store import STORE_KEEP_VERSIONS, ensure_store_tables, run_key, save_rules
+from utils.wisrule_transactions import (MINING_COLUMNS, create_dimension_transactions_vectorized,
+                                        create_yoy_transactions_vectorized, prepare_mining_frame)
+
+# Dimension tables the Wisdom Mining page adds location and utility transactions from
+LOCATION_TABLE = "province_wise_electricity_consumption_gwh"
+UTILITY_TABLE = "electricity_consumption_by_sector_gwh"
+
+# Tables already read by this process, workers keep theirs across jobs
+_table_cache = {}
+
+
+def get_connection():
+    # Imported here so CSV-only runs do not need the MySQL driver
+    from utils.db import get_connection as pooled_connection
+    return pooled_connection()
+
+
+def load_table(table):
+    """A database table, or a CSV file when the name ends in .csv"""
+    if table not in _table_cache:
+        if table.lower().endswith(".csv"):
+            _table_cache[table] = pd.read_csv(table)
+        else:
+            conn = get_connection()
+            try:
+                _table_cache[table] = pd.read_sql(f"SELECT * FROM `{table}`", conn)
+            finally:
+                conn.close()
+    return _table_cache[table].copy()
+
+
+def build_transactions(table, columns=None, dimensions=False):
+    """Transactions of a table built the way the Wisdom Mining page builds them"""
+    data = prepare_mining_frame(load_table(table))
+    if columns is None:
+        columns = [col for col in MINING_COLUMNS if col in data.columns]
+        if not columns:
+            # Tables without the page's columns are mined over all their value columns
+            columns = list(data.columns[1:])
+    transactions, _ = create_yoy_transactions_vectorized(data, columns)
+    if dimensions:
+        transactions.extend(create_dimension_transactions_vectorized(load_table(LOCATION_TABLE),
+                                                                     load_table(UTILITY_TABLE)))
+    return transactions
+
+
+def parameter_grid(args):
+    """Every combination of the parameter values given on the command line"""
+    keys = ("min_support", "min_confidence", "min_utility", "mining_algorithm", "itemset_mode", "top_k")
+    values = (args.min_support, args.min_confidence, args.min_utility, args.mining_algorithm, args.itemset_mode,
+              args.top_k or [None])
+    return [dict(zip(keys, combination)) for combination in itertools.product(*values)]
+
+
+def run_job(job):
+    """Mine one table under one parameter set, inside a worker process"""
+    table, params, options = job
+    started = time.perf_counter()
+    transactions = build_transactions(table, options["columns"], options["dimensions"])
+    miner = WisRuleWithNegative(
+        transactions,
+        min_support=params["min_support"],
+        min_confidence=params["min_confidence"],
+        min_utility=params["min_utility"],
+        counting_engine=options["counting_engine"],
+        mining_algorithm=params["mining_algorithm"],
+        itemset_mode=params["itemset_mode"]
+    )
+    miner.generate_frequent_itemsets()
+    if params["top_k"] is None:
+        miner.generate_rules()
+        rules = miner.get_rules()
+    else:
+        rules = miner.generate_top_rules(params["top_k"])
+    return {
+        "table": table,
+        "params": params,
+        "dataset_version": transaction_fingerprint(transactions),
+        "transactions": len(transactions),
+        "rules": rules,
+        "seconds": time.perf_counter() - started
+    }
+
+
+def rule_rows(result):
+    """Flat output rows of one job's rules"""
+    rows = []
+    for antecedent, negation, consequent, confidence, rule_type, utility, lift, upii, wisval in result["rules"]:
+        rows.append({
+            "table": result["table"],
+            **result["params"],
+            "antecedent": ", ".join(sorted(antecedent)),
+            "negation": negation,
+            "consequent": ", ".join(sorted(consequent)),
+            "confidence": confidence,
+            "rule_type": rule_type,
+            "utility": utility,
+            "lift": lift,
+            "upii": upii,
+            "wisval": wisval
+        })
+    return rows
+
+
+def write_results(results, output):
+    """Write every job's rules to a .csv or .parquet file, or to the wisrule_results store for "db" """
+    if output == "db":
+        # Retention never prunes a dataset version written by this batch
+        keep_versions = max(STORE_KEEP_VERSIONS, len({result["dataset_version"] for result in results}))
+        conn = get_connection()
+        try:
+            ensure_store_tables(conn)
+            for result in results:
+                # Same key as the page, so it finds runs precomputed over the same transactions
+                key = run_key(result["dataset_version"], result["params"])
+                save_rules(conn, key, result["rules"], result["dataset_version"], result["params"],
+                           keep_versions=keep_versions)
+        finally:
+            conn.close()
+        return
+
+    frame = pd.DataFrame([row for result in results for row in rule_rows(result)])
+    if output.lower().endswith(".parquet"):
+        frame.to_parquet(output, index=False)
+    else:
+        frame.to_csv(output, index=False)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Mine WisRule rules for tables x parameter grids without Streamlit")
+    parser.add_argument("tables", nargs="+", help="Database tables, or .csv files, to mine")
+    parser.add_argument("--min-support", type=float, nargs="+", default=[0.3])
+    parser.add_argument("--min-confidence", type=float, nargs="+", default=[0.5])
+    parser.add_argument("--min-utility", type=float, nargs="+", default=[0.1])
+    parser.add_argument("--mining-algorithm", nargs="+", choices=MINING_ALGORITHMS, default=["apriori"])
+    parser.add_argument("--itemset-mode", nargs="+", choices=ITEMSET_MODES, default=["all"])
+    parser.add_argument("--top-k", type=int, nargs="+", help="Keep only the top k rules by WisVal")
+    parser.add_argument("--counting-engine", choices=COUNTING_ENGINES, default="horizontal")
+    parser.add_argument("--columns", nargs="+", help="Value columns to build transactions from")
+    parser.add_argument("--dimensions", action="store_true",
+                        help="Add location and utility dimension transactions, as the page does by default")
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--output", default="wisrule_results.csv",
+                        help="Output .csv or .parquet file, or db for the wisrule_results table")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    options = {"columns": args.columns, "dimensions": args.dimensions, "counting_engine": args.counting_engine}
+    jobs = [(table, params, options) for table in args.tables for params in parameter_grid(args)]
+
+    if args.workers > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=min(args.workers, len(jobs))) as executor:
+            results = list(executor.map(run_job, jobs))
+    else:
+        results = [run_job(job) for job in jobs]
+
+    for result in results:
+        print(f"{result['table']} {result['params']}: {len(result['rules'])} rules from "
+              f"{result['transactions']} transactions in {result['seconds']:.3f}s")
+    write_results(results, args.output)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,224 @@
+"""WisRule scaling benchmark over synthetic transactions
+
+Times mining and every rule metric across transaction counts and writes the results as
+JSON, e.g. from the Streamlit_Dashboards folder:
+
+    python -m utils.wisrule_benchmark --sizes 100 1000 10000 --output bench.json --compare previous.json
+"""
+import argparse
+import json
+import platform
+import random
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+
+from utils.wisrule import COUNTING_ENGINES, MINING_ALGORITHMS, WisRuleWithNegative
+
+# Labels of the page's value columns, as create_yoy_transactions shortens them
+YOY_LABELS = ("Installed", "Generation", "Imports", "Consumption")
+
+# Transaction counts benchmarked by default, 10^2 to 10^6
+DEFAULT_SIZES = (100, 1000, 10000, 100000, 1000000)
+
+# Metric calls timed per size, spread over the mined rules
+METRIC_CALLS = 1000
+
+
+def yoy_labels(vocabulary):
+    """vocabulary value-column labels, the page's first and numbered extra ones after them"""
+    return list(YOY_LABELS[:vocabulary]) + [f"Series{idx}" for idx in range(len(YOY_LABELS), vocabulary)]
+
+
+def generate_yoy_transactions(count, vocabulary=4, density=1.0, correlation=0.5, seed=0):
+    """Synthetic year-over-year transactions shaped like create_yoy_transactions output
+
+    Each label is present with probability density. With probability correlation it follows
+    the trend shared by the whole transaction, otherwise it moves on its own.
+    """
+    rng = random.Random(seed)
+    trends = ("High {} (↑)", "Low {} (↓)", "Stable {} (→)")
+    labels = yoy_labels(vocabulary)
+    transactions = []
+    for idx in range(count):
+        shared = rng.choice(trends)
+        transaction = [
+            (shared if rng.random() < correlation else rng.choice(trends)).format(label)
+            for label in labels if rng.random() < density
+        ]
+        transaction.append(f"Year: {1950 + idx % 75}")
+        transactions.append(transaction)
+    return transactions
+
+
+def generate_dimension_transactions(count, vocabulary=6, density=0.5, correlation=0.5, seed=0, locations=5):
+    """Synthetic location/utility transactions shaped like create_dimension_transactions output
+
+    Each utility is present with probability density. With probability correlation the
+    transaction instead takes the utility profile preferred by its location.
+    """
+    rng = random.Random(seed)
+    utilities = [f"Sector{idx}" for idx in range(vocabulary)]
+    profiles = [[utility for utility in utilities if rng.random() < density] for _ in range(locations)]
+    transactions = []
+    for idx in range(count):
+        location = rng.randrange(locations)
+        transaction = [f"Location: Province{location}", f"Year: {1950 + idx % 75}"]
+        if rng.random() < correlation:
+            chosen = profiles[location]
+        else:
+            chosen = [utility for utility in utilities if rng.random() < density]
+        transaction.extend(f"Utility: {utility}" for utility in chosen)
+        transactions.append(transaction)
+    return transactions
+
+
+GENERATORS = {"yoy": generate_yoy_transactions, "dimension": generate_dimension_transactions}
+
+
+def timed(function, *args, **kwargs):
+    """Result of a call and its wall-clock seconds"""
+    started = time.perf_counter()
+    result = function(*args, **kwargs)
+    return result, time.perf_counter() - started
+
+
+def time_metrics(miner, calls=METRIC_CALLS):
+    """Mean seconds per call of each rule metric, over up to calls mined rules"""
+    rules = miner.rules[:calls]
+    if not rules:
+        return {}
+    splits = [(antecedent, consequent, negation == "") for antecedent, negation, consequent, *_ in rules]
+    metrics = {
+        "calculate_lift": lambda a, c, p: miner.calculate_lift(a, c, p),
+        "calculate_upii": lambda a, c, p: miner.calculate_upii(a, c, p),
+        "calculate_wisval": lambda a, c, p: miner.calculate_wisval(0.5, 1.0, 0.5),
+        "score_rule": lambda a, c, p: miner.score_rule(a, c, p),
+    }
+    timings = {}
+    for name, metric in metrics.items():
+        started = time.perf_counter()
+        for antecedent, consequent, positive in splits:
+            metric(antecedent, consequent, positive)
+        timings[name] = (time.perf_counter() - started) / len(splits)
+    return timings
+
+
+def run_benchmark(size, kind="yoy", vocabulary=4, density=1.0, correlation=0.5, seed=0, min_support=0.1,
+                  min_confidence=0.3, min_utility=0.1, **options):
+    """Generate one transaction set and time mining, rule generation and the metrics on it"""
+    transactions, generate_seconds = timed(GENERATORS[kind], size, vocabulary=vocabulary, density=density,
+                                           correlation=correlation, seed=seed)
+    miner = WisRuleWithNegative(transactions, min_support, min_confidence, min_utility, **options)
+    _, itemset_seconds = timed(miner.generate_frequent_itemsets)
+    _, rule_seconds = timed(miner.generate_rules)
+    return {
+        "transactions": size,
+        "items": len(miner.item_dictionary),
+        "frequent_itemsets": len(miner.item_support),
+        "rules": len(miner.rules),
+        "seconds": {
+            "generate_transactions": generate_seconds,
+            "generate_frequent_itemsets": itemset_seconds,
+            "generate_rules": rule_seconds,
+        },
+        "metric_seconds_per_call": time_metrics(miner),
+    }
+
+
+def code_version():
+    """Commit the benchmark ran against, when run from a git checkout"""
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def compare_results(previous, current):
+    """Lines reporting each timing of current as a ratio of the same timing in previous
+
+    Raises ValueError when the two runs used different parameters, whose timings measure different work.
+    """
+    previous_params, current_params = previous.get("params", {}), current.get("params", {})
+    differing = sorted(name for name in set(previous_params) | set(current_params)
+                       if previous_params.get(name) != current_params.get(name))
+    if differing:
+        raise ValueError("Benchmarks ran with different parameters: " + ", ".join(
+            f"{name} {previous_params.get(name)!r} -> {current_params.get(name)!r}" for name in differing))
+    previous_by_size = {result["transactions"]: result for result in previous["results"]}
+    lines = []
+    for result in current["results"]:
+        before = previous_by_size.get(result["transactions"])
+        if before is None:
+            continue
+        for group in ("seconds", "metric_seconds_per_call"):
+            for name, seconds in result[group].items():
+                old = before[group].get(name)
+                if old:
+                    lines.append(f"{result['transactions']:>8} {name:<28} {seconds / old:6.2f}x")
+    return lines
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark WisRuleWithNegative on synthetic transactions")
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES))
+    parser.add_argument("--kind", choices=tuple(GENERATORS), default="yoy")
+    parser.add_argument("--vocabulary", type=int, default=4, help="Value columns (yoy) or sectors (dimension)")
+    parser.add_argument("--density", type=float, default=1.0, help="Probability each column or sector is present")
+    parser.add_argument("--correlation", type=float, default=0.5, help="Probability an item follows the shared pattern")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--min-support", type=float, default=0.1)
+    parser.add_argument("--min-confidence", type=float, default=0.3)
+    parser.add_argument("--min-utility", type=float, default=0.1)
+    parser.add_argument("--counting-engine", choices=COUNTING_ENGINES, default="bitset")
+    parser.add_argument("--mining-algorithm", choices=MINING_ALGORITHMS, default="apriori")
+    parser.add_argument("--output", default="wisrule_benchmark.json")
+    parser.add_argument("--compare", help="Earlier benchmark JSON to report timing ratios against")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    params = {
+        "kind": args.kind, "vocabulary": args.vocabulary, "density": args.density,
+        "correlation": args.correlation, "seed": args.seed, "min_support": args.min_support,
+        "min_confidence": args.min_confidence, "min_utility": args.min_utility,
+        "counting_engine": args.counting_engine, "mining_algorithm": args.mining_algorithm,
+    }
+    results = []
+    for size in args.sizes:
+        result = run_benchmark(size, **params)
+        seconds = result["seconds"]
+        print(f"{size:>8} transactions: itemsets {seconds['generate_frequent_itemsets']:.3f}s, "
+              f"rules {seconds['generate_rules']:.3f}s ({result['rules']} rules)")
+        results.append(result)
+
+    report = {
+        "version": code_version(),
+        "created_at": datetime.now().isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "params": params,
+        "results": results,
+    }
+    with open(args.output, "w", encoding="utf-8") as output:
+        json.dump(report, output, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as previous:
+            try:
+                lines = compare_results(json.load(previous), report)
+            except ValueError as e:
+                print(f"Not comparing against {args.compare}: {e}")
+                return 1
+        for line in lines:
+            print(line)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
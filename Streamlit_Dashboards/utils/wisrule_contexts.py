@@ -0,0 +1,108 @@
+import re
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from utils.wisrule import WisRuleWithNegative
+
+
+def context_value(transaction, prefix):
+    """Value of the first item carrying the prefix (e.g. "2002-03" for "Year: "), or None"""
+    for item in transaction:
+        if isinstance(item, str) and item.startswith(prefix):
+            return item[len(prefix):]
+    return None
+
+
+def decade_of(year):
+    """Decade label of a year value such as 2002 or "2002-03", or None when it holds no year"""
+    match = re.search(r"\d{4}", str(year))
+    if match is None:
+        return None
+    return f"{int(match.group()) // 10 * 10}s"
+
+
+# Contexts a run can be partitioned by: the transaction item prefix and the grouping of its value
+CONTEXT_PARTITIONS = {
+    "Decade": ("Year: ", decade_of),
+    "Year": ("Year: ", None),
+    "Location": ("Location: ", None),
+}
+
+
+def partition_transactions(transactions, prefix, group=None):
+    """Split transactions by the value of their prefix item, dropping that item from every partition"""
+    # The context item only tells partitions apart, inside one it would just add noise rules
+    partitions = {}
+    for transaction in transactions:
+        value = context_value(transaction, prefix)
+        context = group(value) if group is not None and value is not None else value
+        if context is None:
+            continue
+        partitions.setdefault(context, []).append(
+            [item for item in transaction if not (isinstance(item, str) and item.startswith(prefix))]
+        )
+    return dict(sorted(partitions.items()))
+
+
+def mine_context(context, transactions, params):
+    """Mine one context partition, inside a worker process when the driver runs a pool"""
+    miner = WisRuleWithNegative(transactions, **params)
+    miner.generate_frequent_itemsets()
+    miner.generate_rules()
+    return context, miner.get_rules()
+
+
+def mine_contexts(partitions, min_support, min_confidence, min_utility, workers=1, **options):
+    """Mine every context partition, in a process pool when workers > 1, and index the rules"""
+    params = dict(options, min_support=min_support, min_confidence=min_confidence, min_utility=min_utility)
+    # Each partition is mined serially inside its worker
+    params["rule_workers"] = 1
+    contexts = list(partitions)
+    if workers > 1 and len(contexts) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(contexts))) as executor:
+            # map yields results in context order, so the index is the same as a serial run
+            results = list(executor.map(mine_context, contexts, (partitions[c] for c in contexts), repeat(params)))
+    else:
+        results = [mine_context(context, partitions[context], params) for context in contexts]
+    return ContextRuleIndex(dict(results))
+
+
+class ContextRuleIndex:
+    """Rules keyed by (antecedent, negation, consequent) with the contexts each one holds in"""
+
+    def __init__(self, context_rules):
+        self.contexts = list(context_rules)
+        self.context_rules = context_rules
+        # Rule key -> {context: rule tuple mined in that context}
+        self.rules = {}
+        for context, rules in context_rules.items():
+            for rule in rules:
+                self.rules.setdefault(tuple(rule[:3]), {})[context] = rule
+
+    def contexts_of(self, antecedent, consequent, negation=""):
+        """Contexts in which antecedent -> (negation)consequent holds"""
+        key = (frozenset(antecedent), negation, frozenset(consequent))
+        return [context for context in self.contexts if context in self.rules.get(key, {})]
+
+    def stable_rules(self, contexts=None, min_share=1.0):
+        """Rule keys holding in at least min_share of the contexts, every one of them by default"""
+        contexts = self.contexts if contexts is None else list(contexts)
+        if not contexts:
+            return []
+        required = min_share * len(contexts)
+        return [
+            key for key, holding in self.rules.items()
+            if sum(1 for context in contexts if context in holding) >= required
+        ]
+
+    def contrast_rules(self, context, others=None):
+        """Rule keys holding in context but in none of the other contexts"""
+        others = [other for other in (self.contexts if others is None else others) if other != context]
+        return [
+            key for key, holding in self.rules.items()
+            if context in holding and not any(other in holding for other in others)
+        ]
+
+    def rule_metrics(self, key):
+        """{context: rule tuple} for one rule key"""
+        return dict(self.rules.get(key, {}))
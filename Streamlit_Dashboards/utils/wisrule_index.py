@@ -0,0 +1,75 @@
+import numpy as np
+
+from utils.wisrule import ItemDictionary
+
+# Rule tuple positions of the numeric metrics a RuleIndex can range-filter on
+RULE_METRICS = {"confidence": 3, "utility": 5, "lift": 6, "upii": 7, "wisval": 8}
+
+
+class RuleIndex:
+    """Inverted index from items to the rules they appear in, with metric arrays for range filters"""
+
+    def __init__(self, rules):
+        # Rule ids are positions in rules, e.g. the row labels of a DataFrame built from them
+        self.rules = list(rules)
+        self.item_dictionary = ItemDictionary()
+        antecedent_postings = {}
+        consequent_postings = {}
+        for rule_id, (antecedent, _, consequent, *_) in enumerate(self.rules):
+            for item in antecedent:
+                antecedent_postings.setdefault(self.item_dictionary.encode(item), []).append(rule_id)
+            for item in consequent:
+                consequent_postings.setdefault(self.item_dictionary.encode(item), []).append(rule_id)
+        self.antecedent_postings = {item: np.array(ids, dtype=np.int32) for item, ids in antecedent_postings.items()}
+        self.consequent_postings = {item: np.array(ids, dtype=np.int32) for item, ids in consequent_postings.items()}
+        self.negated = np.array([rule[1] != "" for rule in self.rules], dtype=bool)
+        self.metrics = {
+            name: np.array([rule[position] for rule in self.rules], dtype=float)
+            for name, position in RULE_METRICS.items()
+        }
+
+    def __len__(self):
+        return len(self.rules)
+
+    def find_items(self, text):
+        """Item labels containing text, case-insensitively"""
+        text = text.strip().lower()
+        return [item for item in self.item_dictionary.items if text in str(item).lower()]
+
+    def item_mask(self, item, side="any"):
+        """Rules holding the item in the antecedent, the consequent or either"""
+        mask = np.zeros(len(self.rules), dtype=bool)
+        item_id = self.item_dictionary.item_ids.get(item)
+        if item_id is None:
+            return mask
+        if side in ("any", "antecedent"):
+            mask[self.antecedent_postings.get(item_id, [])] = True
+        if side in ("any", "consequent"):
+            mask[self.consequent_postings.get(item_id, [])] = True
+        return mask
+
+    def query(self, antecedent=(), consequent=(), anywhere=(), match_any=False, negated=None, **ranges):
+        """Ids of the rules matching every given filter, in rule order
+
+        Items on a side must all be present, or any of them with match_any. Ranges are
+        metric=(low, high) pairs from RULE_METRICS, with None leaving that end open.
+        """
+        mask = np.ones(len(self.rules), dtype=bool)
+        for side, items in (("antecedent", antecedent), ("consequent", consequent), ("any", anywhere)):
+            if not items:
+                continue
+            item_masks = [self.item_mask(item, side) for item in items]
+            mask &= np.logical_or.reduce(item_masks) if match_any else np.logical_and.reduce(item_masks)
+        if negated is not None:
+            mask &= self.negated if negated else ~self.negated
+        for name, (low, high) in ranges.items():
+            if name not in self.metrics:
+                raise ValueError(f"Unknown rule metric '{name}', expected one of {tuple(RULE_METRICS)}")
+            if low is not None:
+                mask &= self.metrics[name] >= low
+            if high is not None:
+                mask &= self.metrics[name] <= high
+        return np.flatnonzero(mask)
+
+    def get_rules(self, rule_ids):
+        return [self.rules[rule_id] for rule_id in rule_ids]
@@ -0,0 +1,125 @@
+import hashlib
+import json
+
+from utils.db import ensure_tables
+
+# Rows sent per executemany call when saving a run
+STORE_BATCH_SIZE = 500
+
+# Dataset versions whose runs are kept, runs of older versions are pruned when a run is saved
+STORE_KEEP_VERSIONS = 8
+
+WISRULE_RUNS_DDL = """
+CREATE TABLE IF NOT EXISTS `wisrule_runs` (
+  `run_key` char(64) NOT NULL,
+  `dataset_version` char(64) NOT NULL,
+  `params` text NOT NULL,
+  `rule_count` int NOT NULL,
+  `created_at` timestamp NOT NULL DEFAULT CURRENT_TIMESTAMP,
+  PRIMARY KEY (`run_key`)
+)
+"""
+
+WISRULE_RESULTS_DDL = """
+CREATE TABLE IF NOT EXISTS `wisrule_results` (
+  `run_key` char(64) NOT NULL,
+  `rule_index` int NOT NULL,
+  `antecedent` text NOT NULL,
+  `negation` varchar(4) NOT NULL,
+  `consequent` text NOT NULL,
+  `confidence` double NOT NULL,
+  `rule_type` varchar(16) NOT NULL,
+  `utility` double NOT NULL,
+  `lift` double NOT NULL,
+  `upii` double NOT NULL,
+  `wisval` double NOT NULL,
+  PRIMARY KEY (`run_key`, `rule_index`)
+)
+"""
+
+
+def run_key(dataset_version, params):
+    """Store key of a mining run: a hash of the dataset version and the result-affecting parameters"""
+    payload = json.dumps({"dataset": dataset_version, "params": params}, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def ensure_store_tables(conn):
+    ensure_tables(conn, WISRULE_RUNS_DDL, WISRULE_RESULTS_DDL)
+
+
+def load_rules(conn, key):
+    """Rules of a stored run in their original order, or None when the run was never stored"""
+    cursor = conn.cursor()
+    # The runs row marks a complete run, so a run that kept no rules still counts as stored
+    cursor.execute("SELECT `rule_count` FROM `wisrule_runs` WHERE `run_key` = %s", (key,))
+    if cursor.fetchone() is None:
+        cursor.close()
+        return None
+    cursor.execute(
+        "SELECT `antecedent`, `negation`, `consequent`, `confidence`, `rule_type`, `utility`, `lift`, `upii`, `wisval` "
+        "FROM `wisrule_results` WHERE `run_key` = %s ORDER BY `rule_index`",
+        (key,)
+    )
+    rules = [
+        (frozenset(json.loads(antecedent)), negation, frozenset(json.loads(consequent)),
+         confidence, rule_type, utility, lift, upii, wisval)
+        for antecedent, negation, consequent, confidence, rule_type, utility, lift, upii, wisval in cursor.fetchall()
+    ]
+    cursor.close()
+    return rules
+
+
+def prune_runs(cursor, dataset_version, keep_versions):
+    """Delete the runs of all but the keep_versions most recently stored dataset versions, dataset_version included"""
+    cursor.execute(
+        "SELECT `dataset_version` FROM `wisrule_runs` WHERE `dataset_version` <> %s "
+        "GROUP BY `dataset_version` ORDER BY MAX(`created_at`) DESC",
+        (dataset_version,)
+    )
+    for (stale_version,) in cursor.fetchall()[max(keep_versions - 1, 0):]:
+        cursor.execute(
+            "DELETE FROM `wisrule_results` WHERE `run_key` IN "
+            "(SELECT `run_key` FROM `wisrule_runs` WHERE `dataset_version` = %s)",
+            (stale_version,)
+        )
+        cursor.execute("DELETE FROM `wisrule_runs` WHERE `dataset_version` = %s", (stale_version,))
+
+
+def save_rules(conn, key, rules, dataset_version, params, batch_size=STORE_BATCH_SIZE,
+               keep_versions=STORE_KEEP_VERSIONS):
+    """Replace the stored run under key with rules, inserted in executemany batches in one transaction
+
+    Runs of older dataset versions beyond keep_versions are pruned in the same transaction,
+    None keeps every run.
+    """
+    rows = [
+        (key, idx, json.dumps(sorted(map(str, antecedent))), negation, json.dumps(sorted(map(str, consequent))),
+         float(confidence), rule_type, float(utility), float(lift), float(upii), float(wisval))
+        for idx, (antecedent, negation, consequent, confidence, rule_type, utility, lift, upii, wisval)
+        in enumerate(rules)
+    ]
+    cursor = conn.cursor()
+    try:
+        cursor.execute("DELETE FROM `wisrule_results` WHERE `run_key` = %s", (key,))
+        cursor.execute("DELETE FROM `wisrule_runs` WHERE `run_key` = %s", (key,))
+        for start in range(0, len(rows), batch_size):
+            cursor.executemany(
+                "INSERT INTO `wisrule_results` (`run_key`, `rule_index`, `antecedent`, `negation`, `consequent`, "
+                "`confidence`, `rule_type`, `utility`, `lift`, `upii`, `wisval`) "
+                "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)",
+                rows[start:start + batch_size]
+            )
+        # Written last, so readers never see a half-saved run
+        cursor.execute(
+            "INSERT INTO `wisrule_runs` (`run_key`, `dataset_version`, `params`, `rule_count`) VALUES (%s, %s, %s, %s)",
+            (key, dataset_version, json.dumps(params, sort_keys=True, default=str), len(rows))
+        )
+        if keep_versions is not None:
+            prune_runs(cursor, dataset_version, keep_versions)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cursor.close()
@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+from itertools import compress
+
+
+# Optional helper for year-over-year labels
+def categorize_yoy(current_value, previous_value, label):
+    if previous_value is None:
+        return f"Initial {label}" if current_value > 0 else f"Low {label}"
+    if current_value > previous_value:
+        return f"High {label} (↑)"
+    elif current_value < previous_value:
+        return f"Low {label} (↓)"
+    else:
+        return f"Stable {label} (→)"
+
+# Transaction creation from YOY analysis
+def create_yoy_transactions(df, columns):
+    year_col = None
+    for col in df.columns:
+        if 'year' in col.lower():
+            year_col = col
+            df = df.sort_values(by=year_col)
+            break
+            
+    transactions = []
+    previous_values = {col: None for col in columns}
+    column_names = []
+    
+    for idx, row in df.iterrows():
+        transaction = []
+        for col in columns:
+            if col in df.columns:
+                label = col.split(" ")[0]  # Extract the label part (e.g., "Imports" from "Imports (GWh)")
+                current_value = row[col]
+                previous_value = previous_values[col]
+                
+                # Categorize based on year-over-year comparison
+                category = categorize_yoy(current_value, previous_value, label)
+                transaction.append(category)
+                
+                # Update previous value for the next iteration
+                previous_values[col] = current_value
+                
+                # Store column name for first row
+                if len(column_names) < len(columns):
+                    column_names.append(col)
+        
+        # Add year information if available
+        if year_col:
+            transaction.append(f"Year: {row[year_col]}")
+            if len(column_names) < len(columns) + 1:
+                column_names.append("Year")
+                
+        transactions.append(transaction)
+    
+    return transactions, column_names
+
+# Create transactions from utility/location dimensions
+def create_dimension_transactions(location_df, utility_df):
+    transactions = []
+    for i in range(len(location_df)):
+        row = []
+        location = location_df.iloc[i].get("Province") or location_df.iloc[i].get("Region")
+        if location:
+            row.append(f"Location: {location}")
+        year = location_df.iloc[i].get("Year")
+        if year:
+            row.append(f"Year: {year}")
+        for col in utility_df.columns[1:]:
+            val = utility_df.iloc[i][col]
+            if pd.notna(val):
+                row.append(f"Utility: {col}")
+        transactions.append(row)
+    return transactions
+
+
+# Value columns the Wisdom Mining page builds year-over-year transactions from
+MINING_COLUMNS = ["Installed Capacity (GWh)", "Generation (GWh)", "Imports (GWh)", "Consumption (GWh)"]
+
+
+def prepare_mining_frame(data):
+    """Table as the Wisdom Mining page mines it: capacity in GWh, value columns numeric, gaps zeroed"""
+    # Optional conversion if Installed Capacity (MW) exists
+    if "Installed Capacity (MW)" in data.columns:
+        data["Installed Capacity (MW)"] = (data["Installed Capacity (MW)"] * 8760) / 1000
+        data.rename(columns={"Installed Capacity (MW)": "Installed Capacity (GWh)"}, inplace=True)
+
+    for col in data.columns[1:]:
+        data[col] = pd.to_numeric(data[col], errors="coerce")
+    data.fillna(0, inplace=True)
+    return data
+
+
+def find_year_column(df):
+    """First column whose name mentions the year, as create_yoy_transactions picks it"""
+    for col in df.columns:
+        if 'year' in col.lower():
+            return col
+    return None
+
+
+def row_values(df, col):
+    """Column values as a row-wise iterrows/iloc walk would see them, in the frame's common dtype"""
+    return df.values[:, df.columns.get_loc(col)]
+
+
+def is_truthy(values):
+    """Element-wise truth value of an array, matching Python's bool()"""
+    if values.dtype.kind in "biufc":
+        return values != 0
+    return np.fromiter(map(bool, values), dtype=bool, count=len(values))
+
+
+def categorize_yoy_column(values, label):
+    """Vectorized categorize_yoy over a whole column, comparing each year with the one before"""
+    current = values[1:]
+    previous = values[:-1]
+    with np.errstate(invalid="ignore"):
+        rising = np.asarray(current > previous, dtype=bool)
+        falling = np.asarray(current < previous, dtype=bool)
+    categories = np.select(
+        [rising, falling],
+        [f"High {label} (↑)", f"Low {label} (↓)"],
+        default=f"Stable {label} (→)"
+    ).astype(object)
+    first = f"Initial {label}" if values[0] > 0 else f"Low {label}"
+    return np.concatenate([np.array([first], dtype=object), categories])
+
+
+def create_yoy_transactions_vectorized(df, columns):
+    """Column-wise create_yoy_transactions, emitting the same transactions and column names"""
+    year_col = find_year_column(df)
+    if year_col:
+        df = df.sort_values(by=year_col)
+    if df.empty:
+        return [], []
+
+    present = [col for col in columns if col in df.columns]
+    label_columns = [categorize_yoy_column(row_values(df, col), col.split(" ")[0]) for col in present]
+    if year_col:
+        label_columns.append([f"Year: {year}" for year in row_values(df, year_col)])
+    transactions = [list(row) for row in zip(*label_columns)] if label_columns else [[] for _ in range(len(df))]
+
+    # Column names grow exactly as the row loop appends them, which settles within a few rows
+    column_names = []
+    for _ in range(min(len(df), len(columns) + 2)):
+        for col in present:
+            if len(column_names) < len(columns):
+                column_names.append(col)
+        if year_col and len(column_names) < len(columns) + 1:
+            column_names.append("Year")
+    return transactions, column_names
+
+
+def create_dimension_transactions_vectorized(location_df, utility_df):
+    """Column-wise create_dimension_transactions, emitting the same transactions"""
+    row_count = len(location_df)
+    if row_count > len(utility_df):
+        # The row loop fails on the first location row without a utility row
+        raise IndexError("single positional indexer is out-of-bounds")
+    if row_count == 0:
+        return []
+
+    label_columns = []
+    locations = None
+    for col in ("Province", "Region"):
+        if col in location_df.columns:
+            values = row_values(location_df, col).astype(object)
+            # location = Province or Region
+            locations = values if locations is None else np.where(is_truthy(locations), locations, values)
+    if locations is not None:
+        label_columns.append([f"Location: {location}" if keep else None
+                              for location, keep in zip(locations, is_truthy(locations))])
+    if "Year" in location_df.columns:
+        years = row_values(location_df, "Year")
+        label_columns.append([f"Year: {year}" if keep else None for year, keep in zip(years, is_truthy(years))])
+
+    utility_columns = list(utility_df.columns[1:])
+    utility_labels = [f"Utility: {col}" for col in utility_columns]
+    present = utility_df.iloc[:row_count][utility_columns].notna().to_numpy()
+
+    transactions = []
+    for idx in range(row_count):
+        row = [labels[idx] for labels in label_columns if labels[idx] is not None]
+        row.extend(compress(utility_labels, present[idx]))
+        transactions.append(row)
+    return transactions
@@ -0,0 +1,160 @@
+import numpy as np
+
+# Transactions multiplied against the itemset membership matrix per chunk
+UTILITY_CHUNK_ROWS = 4096
+
+
+def incidence_matrix(transactions, item_ids=None):
+    """Transaction x item boolean incidence matrix and the item -> column mapping it uses"""
+    if item_ids is None:
+        item_ids = {}
+        for transaction in transactions:
+            for item in transaction:
+                item_ids.setdefault(item, len(item_ids))
+    rows = [tid for tid, transaction in enumerate(transactions) for item in transaction if item in item_ids]
+    columns = [item_ids[item] for transaction in transactions for item in transaction if item in item_ids]
+    incidence = np.zeros((len(transactions), len(item_ids)), dtype=bool)
+    incidence[rows, columns] = True
+    return incidence, item_ids
+
+
+def itemset_membership(itemsets, item_ids):
+    """Itemset x item 0/1 matrix, plus a mask of itemsets holding an item absent from item_ids"""
+    membership = np.zeros((len(itemsets), len(item_ids)), dtype=np.int32)
+    unknown = np.zeros(len(itemsets), dtype=bool)
+    for idx, itemset in enumerate(itemsets):
+        for item in itemset:
+            column = item_ids.get(item)
+            if column is None:
+                unknown[idx] = True
+            else:
+                membership[idx, column] = 1
+    return membership, unknown
+
+
+def itemset_counts(incidence, itemsets, item_ids, chunk_rows=UTILITY_CHUNK_ROWS):
+    """Transactions containing each itemset, for all itemsets at once"""
+    membership, unknown = itemset_membership(itemsets, item_ids)
+    sizes = membership.sum(axis=1)
+    counts = np.zeros(len(itemsets), dtype=np.int64)
+    for start in range(0, incidence.shape[0], chunk_rows):
+        # A transaction holds an itemset when it has as many of its items as the itemset has
+        hits = incidence[start:start + chunk_rows].astype(np.int32) @ membership.T
+        counts += (hits == sizes).sum(axis=0)
+    counts[unknown] = 0
+    return counts
+
+
+def itemset_supports_vectorized(itemsets, transactions):
+    """Support of every itemset from one incidence matrix of the transactions"""
+    incidence, item_ids = incidence_matrix(transactions)
+    return itemset_counts(incidence, itemsets, item_ids) / len(transactions)
+
+
+def create_utility_dict_vectorized(itemsets, transactions):
+    """create_utility_dict from an incidence matrix: size-based utility len(I) * support(I) per itemset"""
+    itemsets = list(itemsets)
+    sizes = np.array([len(itemset) for itemset in itemsets], dtype=np.int64)
+    utilities = sizes * itemset_supports_vectorized(itemsets, transactions)
+    return dict(zip(itemsets, utilities.tolist()))
+
+
+def utility_dict_from_supports(support_dict):
+    """Size-based utilities straight from already counted supports, no pass over the transactions"""
+    return {itemset: len(itemset) * support for itemset, support in support_dict.items()}
+
+
+def adjust_support_based_on_context_vectorized(context_values, normal_range, base_support, adjustment_factor=0.05):
+    """adjust_support_based_on_context over arrays, NaN or None standing in for a missing context value"""
+    context_values = np.asarray(context_values, dtype=float)
+    base_support = np.asarray(base_support, dtype=float)
+    outside = (context_values < normal_range[0]) | (context_values > normal_range[1])
+    adjusted = np.where(outside, base_support - adjustment_factor, base_support + adjustment_factor)
+    return np.where(np.isnan(context_values), base_support, adjusted)
+
+
+def rule_itemsets(rules):
+    """Distinct itemsets of (antecedent, consequent) pairs, with the positions of each pair's antecedent,
+    consequent and union among them, so every itemset is looked up once however many rules share it"""
+    positions = {}
+
+    def index(itemsets):
+        return np.fromiter((positions.setdefault(itemset, len(positions)) for itemset in itemsets),
+                           dtype=np.intp, count=len(rules))
+
+    antecedents = index(antecedent for antecedent, _ in rules)
+    consequents = index(consequent for _, consequent in rules)
+    unions = index(antecedent.union(consequent) for antecedent, consequent in rules)
+    return list(positions), antecedents, consequents, unions
+
+
+def lookup(itemsets, mapping, default):
+    return np.fromiter((mapping.get(itemset, default) for itemset in itemsets), dtype=float, count=len(itemsets))
+
+
+def rule_arrays(rules, support_dict, utility_dict, negative=None):
+    """Supports and utilities of the antecedent, consequent and union of each rule
+
+    A negative rule A -> not B stands on the complement of its consequent: s(not B) = 1 - s(B) and
+    s(A, not B) = s(A) - s(A, B). Utility dicts only hold itemsets, so complements get calculate_upii's
+    default utility of 1.
+    """
+    itemsets, antecedents, consequents, unions = rule_itemsets(rules)
+    supports = lookup(itemsets, support_dict, 0)
+    utilities = lookup(itemsets, utility_dict, 1)
+    supp_a, supp_b, supp_ab = supports[antecedents], supports[consequents], supports[unions]
+    u_a, u_b, u_ab = utilities[antecedents], utilities[consequents], utilities[unions]
+    if negative is not None:
+        negative = np.asarray(negative, dtype=bool)
+        supp_b, supp_ab = np.where(negative, 1 - supp_b, supp_b), np.where(negative, supp_a - supp_ab, supp_ab)
+        u_b, u_ab = np.where(negative, 1, u_b), np.where(negative, 1, u_ab)
+    return (supp_a, supp_b, supp_ab), (u_a, u_b, u_ab)
+
+
+def upii_from_arrays(supports, utilities):
+    supp_a, supp_b, supp_ab = supports
+    u_a, u_b, u_ab = utilities
+    denominator = u_a * supp_a * (1 - supp_b)
+    # Same expected term as calculate_upii, which weighs U_B by the antecedent support
+    numerator = (u_ab * supp_ab) - (u_a * supp_a * u_b * supp_a)
+    return np.divide(numerator, denominator, out=np.zeros(len(supp_a)), where=denominator != 0)
+
+
+def calculate_upii_vectorized(rules, support_dict, utility_dict, negative=None):
+    """calculate_upii for every (antecedent, consequent) pair at once"""
+    return upii_from_arrays(*rule_arrays(list(rules), support_dict, utility_dict, negative))
+
+
+def evaluate_full_rules(rules, support_dict, utility_dict, context_values=None, normal_range=(0, 100),
+                        weights=(0.25, 0.25, 0.25, 0.25), negative=None):
+    """evaluate_full_rule for every (antecedent, consequent) pair at once
+
+    context_values holds one value per rule, None (or NaN) leaving that rule's support unadjusted.
+    negative flags the rules whose consequent is negated, scored on its complement.
+    """
+    rules = list(rules)
+    supports, utilities = rule_arrays(rules, support_dict, utility_dict, negative)
+    supp_a, supp_b, supp_ab = supports
+    utility = upii_from_arrays(supports, utilities)
+    product = supp_a * supp_b
+    interestingness = np.divide(supp_ab, product, out=np.zeros(len(rules)), where=product != 0)
+
+    support = supp_ab
+    if context_values is not None:
+        support = adjust_support_based_on_context_vectorized(context_values, normal_range, supp_ab)
+
+    alpha, beta, gamma, delta = weights
+    wisval = (alpha * support) + (beta * supp_a) + (gamma * utility) + (delta * interestingness)
+
+    return [
+        {
+            "antecedent": antecedent,
+            "consequent": consequent,
+            "support": support[idx].item(),
+            "confidence": supp_a[idx].item(),
+            "utility": utility[idx].item(),
+            "interestingness": interestingness[idx].item(),
+            "wisval": wisval[idx].item()
+        }
+        for idx, (antecedent, consequent) in enumerate(rules)
+    ]